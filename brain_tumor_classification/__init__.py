@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Brain tumor classification of hyperspectral images with support vector machines.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    Public classes and functions of the package are loaded on first access,
+    so `import brain_tumor_classification` does not import `matplotlib`,
+    `scipy` or `scikit-learn`. Each one is only imported by the submodule
+    that needs it, when it is used.
+   """
+
+from importlib import import_module
+from typing import Any, Dict, List
+
+# Public name -> submodule that defines it
+_EXPORTS: Dict[str, str] = {
+    "ClassificationMap": "classification_maps",
+    "GroundTruthMap": "ground_truth_maps",
+    "GroundTruthDataResults": "ground_truth_maps",
+    "LazyGroundTruthDataResults": "ground_truth_maps",
+    "HSI_LABEL_INFO": "hsi_labels",
+    "PredictionCache": "prediction_cache",
+    "ProbabilityMapStore": "output_store",
+    "save_probability_map": "output_store",
+    "coarse_to_fine_predict_proba": "coarse_to_fine",
+    "StreamingClassifier": "streaming",
+    "PrecomputedGridSearchCV": "gram_cache",
+    "SuccessiveHalvingSearch": "successive_halving",
+    "TrainingStore": "dataset_builder",
+    "build_training_store": "dataset_builder",
+    "SpectralIndex": "spectral_index",
+    "ParallelOneVsOneSVC": "pairwise_training",
+    "SQLiteBroker": "distributed",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value  # Cache it, so next accesses do not call __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
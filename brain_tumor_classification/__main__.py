@@ -0,0 +1,7 @@
+""" Entry point of `python -m brain_tumor_classification`. """
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -14,23 +14,28 @@
     classification maps after predicting data.
    """
 
-from typing import Any, List, Union
+from typing import TYPE_CHECKING, Any, List, Union
 
 
 import numpy as np
 from numpy.typing import NDArray
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
 
-from hsi_labels import HSI_LABEL_INFO
-from helpers import check_path
+from .hsi_labels import HSI_LABEL_INFO
+from .helpers import check_path, get_pyplot
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
 
 
 class ClassificationMap:
     """Class to compute binary and probabilistic classification maps."""
 
     def __init__(
-        self, cube_shape: NDArray[Any], map: NDArray[Any], unique_labels: NDArray[Any]
+        self,
+        cube_shape: NDArray[Any],
+        map: NDArray[Any],
+        unique_labels: NDArray[Any],
+        argmax: NDArray[Any] = None,
     ) -> None:
         """
 
@@ -41,15 +46,20 @@ class ClassificationMap:
         probabilities by a `scikit-learn` estimator after using `predict_proba()`.
         - `unique_labels`: Unique labels included in `map`. Tip: Unique labels should be the same
         as those used to train the model that classified the map (`y_train`).
+        - `argmax`: Optional numpy vector of shape (n_samples,) with the column of `map` of the
+        predicted label of every sample. If passed, the binary map is computed from it instead
+        of the maximum of `map` (e.g. for quantized probabilities, where maxima can be tied).
         """
 
         self._cube_shape = cube_shape
         self._pred_map = map
         self._unique_labels = unique_labels
+        self._argmax = argmax
 
         # To store the computed classification map with probabilities and binary
         self._map: NDArray[Any] = np.array(None)
         self._binary_map: NDArray[Any] = np.array(None)
+        self._label_colors: NDArray[Any] = np.array(None)
         self._maps_computed = False
 
         self.__compute_map()  # Compute map
@@ -79,7 +89,7 @@ class ClassificationMap:
         path_: str = "./",
         file_suffix: str = "suffix",
         file_format: str = "png",
-    ) -> Union[List[Figure], None]:
+    ) -> Union[List["Figure"], None]:
         """
         Save the computed classification map. It does nothing if the map has not been computed.
         Additionally, it can also show the plot
@@ -112,7 +122,8 @@ class ClassificationMap:
             "cls_map": self._map,
         }
 
-        map_figures: List[Figure] = []
+        plt = get_pyplot()
+        map_figures: List["Figure"] = []
 
         # Plot and save both binary and probabilistic classification maps
         for classification_map in [proba_map, binary_map]:
@@ -138,6 +149,28 @@ class ClassificationMap:
 
         return map_figures
 
+    def update(self, indices: NDArray[Any], map: NDArray[Any]) -> None:
+        """
+        Updates the probabilities of some pixels and recolors only those pixels
+        in both the probabilistic and the binary classification maps.
+
+        Parameters
+        ----------
+        - `indices`: Flat indices (row * columns + column) of the pixels to update.
+        - `map`: Numpy vector of shape (len(indices), n_clases) with the new predicted
+        label probabilities of the pixels.
+        """
+        if not self._maps_computed or len(indices) == 0:
+            return
+
+        self._pred_map[indices] = map
+
+        rows, cols = np.unravel_index(indices, (self._cube_shape[0], self._cube_shape[1]))
+        self._map[rows, cols] = np.matmul(map, self._label_colors)
+
+        max_val = np.amax(map, axis=1, keepdims=True)
+        self._binary_map[rows, cols] = np.matmul(map // max_val, self._label_colors)
+
     def __compute_map(self) -> None:
         """
         Generates a color map by translating each label value to an RGB value.
@@ -159,6 +192,8 @@ class ClassificationMap:
             / 255.0
         )
 
+        self._label_colors = label_colors
+
         # * Compute probability map
         colored_proba_pixels: NDArray[Any] = np.matmul(self._pred_map, label_colors)
         self._map = colored_proba_pixels.reshape(self._cube_shape[0], self._cube_shape[1], 3)
@@ -166,8 +201,11 @@ class ClassificationMap:
         self._maps_computed = True
 
         # * Compute and store binary map
-        max_val = np.amax(self._pred_map, axis=1, keepdims=True)
-        colored_pixels: NDArray[Any] = np.matmul(self._pred_map // max_val, label_colors)
+        if self._argmax is not None:
+            colored_pixels: NDArray[Any] = label_colors[np.asarray(self._argmax).ravel()]
+        else:
+            max_val = np.amax(self._pred_map, axis=1, keepdims=True)
+            colored_pixels = np.matmul(self._pred_map // max_val, label_colors)
         self._binary_map = colored_pixels.reshape(self._cube_shape[0], self._cube_shape[1], 3)
 
         self._maps_computed = True
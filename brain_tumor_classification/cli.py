@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Command line interface of the package.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains the `python -m brain_tumor_classification` commands.
+    Every command imports the submodules it needs when it runs, so commands
+    that only render or score stored results never import `scikit-learn`,
+    and `matplotlib` is only imported by commands that save plots.
+   """
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Modules considered heavy by `bench-import`
+HEAVY_MODULES = ("matplotlib.pyplot", "scipy.io", "sklearn", "sklearn.model_selection")
+
+# Modules measured by `bench-import`
+BENCHMARKED_MODULES = (
+    "brain_tumor_classification",
+    "brain_tumor_classification.cli",
+    "brain_tumor_classification.classification_maps",
+    "brain_tumor_classification.ground_truth_maps",
+    "brain_tumor_classification.output_store",
+    "brain_tumor_classification.prediction_cache",
+    "brain_tumor_classification.gram_cache",
+)
+
+
+def parse_region(region: str) -> slice:
+    """Parses a `start:stop` string into a slice. Empty bounds are allowed (e.g. `:100`)."""
+    start, _, stop = region.partition(":")
+    return slice(int(start) if start else None, int(stop) if stop else None)
+
+
+def classify(args: argparse.Namespace) -> int:
+    """Trains an SVM, classifies a cube, saves the classification maps and archives them."""
+    from sklearn.svm import SVC
+
+    from .helpers import load_cube, load_datasets
+    from .output_store import save_probability_map
+    from .prediction_cache import PredictionCache, model_fingerprint
+
+    data, labels, _ = load_datasets(args.dataset_path, args.train_patients)
+    model = SVC(
+        kernel=args.kernel, C=args.C, gamma=args.gamma, probability=True, random_state=args.seed
+    )
+    model.fit(X=data, y=labels)
+
+    cube = load_cube(args.cube_path, args.patient_id)
+    cache = PredictionCache(args.cache_path)
+    cls_map = cache.classification_map(model, cube)
+    cls_map.plot(
+        title=f"Patient classified with {type(model).__name__}",
+        path_=args.output_path,
+        file_suffix=args.patient_id,
+        file_format=args.file_format,
+    )
+    save_probability_map(
+        f"{args.output_path.rstrip('/')}/ProbabilityMap_{args.patient_id}.npz",
+        pred_map=cache.predict_proba(model, cube),
+        cube_shape=cube.shape,
+        unique_labels=model.classes_,
+        model_id=model_fingerprint(model),
+    )
+    print(f"Prediction cache: {cache.stats}")
+    return 0
+
+
+def render(args: argparse.Namespace) -> int:
+    """Saves the classification maps of a probability map archived with `save_probability_map()`."""
+    from .output_store import ProbabilityMapStore
+
+    store = ProbabilityMapStore(args.store)
+    cls_map = store.classification_map(parse_region(args.rows), parse_region(args.cols))
+    store.close()
+
+    cls_map.plot(
+        title=args.title,
+        path_=args.output_path,
+        file_suffix=args.file_suffix,
+        file_format=args.file_format,
+    )
+    return 0
+
+
+def score(args: argparse.Namespace) -> int:
+    """Computes the accuracy of an archived probability map on the labeled ground-truth pixels."""
+    import numpy as np
+
+    from .ground_truth_maps import GroundTruthMap
+    from .output_store import ProbabilityMapStore
+
+    store = ProbabilityMapStore(args.store)
+    predicted = store.read_labels()
+    store.close()
+
+    gt_map = GroundTruthMap(args.gt_path, args.patient_id).groundTruthMap
+    # Labeled pixels of classes the model never saw count as errors
+    labeled = gt_map != 0
+    acc = np.mean(predicted[labeled] == gt_map[labeled])
+    print(f"ACCURACY (on {np.count_nonzero(labeled)} labeled pixels): {100*acc:.2f}%")
+    return 0
+
+
+def ground_truth(args: argparse.Namespace) -> int:
+    """Saves the colored ground-truth map of a patient."""
+    from .ground_truth_maps import GroundTruthMap
+
+    gt = GroundTruthMap(args.gt_path, args.patient_id)
+    gt.plot(
+        title=f"Ground truth from patient {args.patient_id}",
+        path_=args.output_path,
+        file_suffix=f"GT_{args.patient_id}",
+        file_format=args.file_format,
+    )
+    return 0
+
+
+def build_dataset(args: argparse.Namespace) -> int:
+    """Builds a training store from hyperspectral cubes and ground-truth maps."""
+    from .dataset_builder import build_training_store
+
+    build_training_store(
+        cube_path=args.cube_path,
+        gt_path=args.gt_path,
+        patient_ids=args.patients,
+        store_path=args.store_path,
+        class_caps=args.class_cap,
+        seed=args.seed,
+        n_jobs=args.n_jobs,
+    )
+    return 0
+
+
+def sweep_submit(args: argparse.Namespace) -> int:
+    """Queues the tasks of a leave-one-patient-out sweep over (kernel, C, gamma)."""
+    from .distributed import SQLiteBroker, build_sweep_tasks
+
+    param_grid = {"kernel": args.kernels, "C": args.C, "gamma": args.gamma}
+    tasks = build_sweep_tasks(args.dataset_path, args.patients, param_grid, args.seed)
+    new_tasks = SQLiteBroker(args.db, args.max_attempts).submit(tasks)
+    print(f"{new_tasks} new tasks queued ({len(tasks) - new_tasks} were already queued).")
+    return 0
+
+
+def sweep_worker(args: argparse.Namespace) -> int:
+    """Runs queued sweep tasks until none is available."""
+    from .distributed import SQLiteBroker, run_worker
+
+    broker = SQLiteBroker(args.db, args.max_attempts)
+    completed = run_worker(broker, args.worker, args.max_tasks, args.lease_seconds)
+    print(f"{completed} tasks completed. Queue: {broker.progress()}")
+    return 0
+
+
+def sweep_report(args: argparse.Namespace) -> int:
+    """Prints the results of a sweep aggregated per parameters, even if it is not finished."""
+    from .distributed import SQLiteBroker, aggregate
+
+    broker = SQLiteBroker(args.db)
+    print(f"Queue: {broker.progress()}")
+    for row in aggregate(broker):
+        print(
+            f"{json.dumps(row['params'], sort_keys=True):<50} "
+            f"ACCURACY {100*row['mean_accuracy']:.2f}% ± {100*row['std_accuracy']:.2f}% "
+            f"({row['folds']} folds)"
+        )
+    return 0
+
+
+def measure_import(module: str, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Measures the import time of a module in fresh Python interpreters.
+
+    Parameters
+    ----------
+    - `module`: Name of the module to import.
+    - `repeat`: Number of interpreters. The fastest import is reported.
+
+    Returns
+    -------
+    - Python dictionary with the import `time` in seconds and the `heavy` modules it imported.
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'time': elapsed, 'heavy': heavy}))\n"
+    )
+
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    return min(results, key=lambda result: result["time"])
+
+
+def bench_import(args: argparse.Namespace) -> int:
+    """Prints the import time of the package modules and the heavy modules they import."""
+    for module in args.modules or BENCHMARKED_MODULES:
+        result = measure_import(module, args.repeat)
+        heavy = ", ".join(result["heavy"]) or "-"
+        print(f"{module:<50} {1000*result['time']:8.1f} ms   heavy imports: {heavy}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the parser of every command."""
+    parser = argparse.ArgumentParser(
+        prog="brain_tumor_classification",
+        description="Brain tumor classification of hyperspectral images with SVMs.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("classify", help=classify.__doc__)
+    command.add_argument("--dataset-path", default="./data/dataset/")
+    command.add_argument("--train-patients", nargs="+", required=True)
+    command.add_argument("--cube-path", default="./data/cubes/")
+    command.add_argument("--patient-id", required=True)
+    command.add_argument("--output-path", default="./outputs/")
+    command.add_argument("--cache-path", default="./outputs/cache/")
+    command.add_argument("--kernel", default="linear")
+    command.add_argument("--C", type=float, default=1.0)
+    command.add_argument("--gamma", type=float, default=1.0)
+    command.add_argument("--seed", type=int, default=2022)
+    command.add_argument("--file-format", default="png")
+    command.set_defaults(func=classify)
+
+    command = commands.add_parser("render", help=render.__doc__)
+    command.add_argument("store", help="`.npz` file written by `save_probability_map()`.")
+    command.add_argument("--title", default="Patient classified")
+    command.add_argument("--rows", default=":", help="Region rows as `start:stop`.")
+    command.add_argument("--cols", default=":", help="Region columns as `start:stop`.")
+    command.add_argument("--output-path", default="./outputs/")
+    command.add_argument("--file-suffix", default="suffix")
+    command.add_argument("--file-format", default="png")
+    command.set_defaults(func=render)
+
+    command = commands.add_parser("score", help=score.__doc__)
+    command.add_argument("store", help="`.npz` file written by `save_probability_map()`.")
+    command.add_argument("--gt-path", default="./data/ground-truth/")
+    command.add_argument("--patient-id", required=True)
+    command.set_defaults(func=score)
+
+    command = commands.add_parser("ground-truth", help=ground_truth.__doc__)
+    command.add_argument("--gt-path", default="./data/ground-truth/")
+    command.add_argument("--patient-id", required=True)
+    command.add_argument("--output-path", default="./outputs/")
+    command.add_argument("--file-format", default="png")
+    command.set_defaults(func=ground_truth)
+
+    command = commands.add_parser("build-dataset", help=build_dataset.__doc__)
+    command.add_argument("--cube-path", default="./data/cubes/")
+    command.add_argument("--gt-path", default="./data/ground-truth/")
+    command.add_argument("--patients", nargs="+", required=True)
+    command.add_argument("--store-path", default="./data/store/")
+    command.add_argument("--class-cap", type=int, default=None)
+    command.add_argument("--seed", type=int, default=None)
+    command.add_argument("--n-jobs", type=int, default=-1)
+    command.set_defaults(func=build_dataset)
+
+    command = commands.add_parser("sweep-submit", help=sweep_submit.__doc__)
+    command.add_argument("--db", default="./outputs/sweep.sqlite")
+    command.add_argument("--dataset-path", default="./data/dataset/")
+    command.add_argument("--patients", nargs="+", required=True)
+    command.add_argument("--kernels", nargs="+", default=["linear", "rbf"])
+    command.add_argument("--C", nargs="+", type=float, default=[1.0])
+    command.add_argument("--gamma", nargs="+", type=float, default=[1.0])
+    command.add_argument("--seed", type=int, default=2022)
+    command.add_argument("--max-attempts", type=int, default=3)
+    command.set_defaults(func=sweep_submit)
+
+    command = commands.add_parser("sweep-worker", help=sweep_worker.__doc__)
+    command.add_argument("--db", default="./outputs/sweep.sqlite")
+    command.add_argument("--worker", default=None, help="Worker ID (host and PID by default).")
+    command.add_argument("--max-tasks", type=int, default=None)
+    command.add_argument("--lease-seconds", type=float, default=3600.0)
+    command.add_argument("--max-attempts", type=int, default=3)
+    command.set_defaults(func=sweep_worker)
+
+    command = commands.add_parser("sweep-report", help=sweep_report.__doc__)
+    command.add_argument("--db", default="./outputs/sweep.sqlite")
+    command.set_defaults(func=sweep_report)
+
+    command = commands.add_parser("bench-import", help=bench_import.__doc__)
+    command.add_argument("modules", nargs="*", help="Modules to measure (package by default).")
+    command.add_argument("--repeat", type=int, default=5)
+    command.set_defaults(func=bench_import)
+
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """Runs the command passed in `argv` (or in the command line)."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Coarse-to-fine classification of hyperspectral cubes.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains functions to classify a hyperspectral cube in two
+    steps. First, a spatially downsampled version of the cube is classified
+    and upsampled back to full resolution. Then, only the pixels whose
+    coarse prediction is uncertain (low probability margin) or that lie on
+    a boundary between classes are classified again at full resolution.
+    The result is a probability map compatible with `ClassificationMap`.
+   """
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+@dataclass
+class CoarseToFineStats:
+    """Dataclass with the statistics of a coarse-to-fine classification."""
+
+    factor: int
+    refined_pixels: int
+    total_pixels: int
+    coarse_time: float
+    refine_time: float
+
+    @property
+    def refined_fraction(self) -> float:
+        """Fraction of pixels classified again at full resolution."""
+        return self.refined_pixels / self.total_pixels
+
+    @property
+    def total_time(self) -> float:
+        """Time in seconds spent in both the coarse and the refinement steps."""
+        return self.coarse_time + self.refine_time
+
+
+def downsample_cube(cube: NDArray[Any], factor: int) -> NDArray[Any]:
+    """
+    Downsamples a cube by averaging the spectra of non-overlapping `factor` x `factor` blocks.
+    Borders are padded by repeating the last row/column if the cube size is not a multiple of `factor`.
+
+    Parameters
+    ----------
+    - `cube`: Hyperspectral cube of shape (rows, columns, bands).
+    - `factor`: Spatial downsampling factor.
+
+    Returns
+    -------
+    - Numpy array of shape (ceil(rows / factor), ceil(columns / factor), bands).
+    """
+    rows, cols, bands = cube.shape
+    pad_rows, pad_cols = -rows % factor, -cols % factor
+    if pad_rows or pad_cols:
+        cube = np.pad(cube, ((0, pad_rows), (0, pad_cols), (0, 0)), mode="edge")
+
+    coarse_rows, coarse_cols = cube.shape[0] // factor, cube.shape[1] // factor
+    return cube.reshape(coarse_rows, factor, coarse_cols, factor, bands).mean(axis=(1, 3))
+
+
+def uncertain_blocks(
+    coarse_proba: NDArray[Any], margin: float, refine_boundaries: bool = True
+) -> NDArray[np.bool_]:
+    """
+    Selects the coarse pixels that should be classified again at full resolution.
+
+    Parameters
+    ----------
+    - `coarse_proba`: Probabilities of the coarse cube, of shape (rows, columns, n_classes).
+    - `margin`: Coarse pixels whose difference between the two most likely classes is
+    lower than `margin` are selected.
+    - `refine_boundaries`: Flag to also select coarse pixels with a neighbour (4-connectivity)
+    predicted as a different class.
+
+    Returns
+    -------
+    - Boolean mask of shape (rows, columns).
+    """
+    if coarse_proba.shape[-1] < 2:
+        return np.zeros(coarse_proba.shape[:2], dtype=bool)
+
+    top_two = np.partition(coarse_proba, -2, axis=-1)[..., -2:]
+    mask = (top_two[..., 1] - top_two[..., 0]) < margin
+
+    if refine_boundaries:
+        labels = np.argmax(coarse_proba, axis=-1)
+        vertical = labels[1:, :] != labels[:-1, :]
+        horizontal = labels[:, 1:] != labels[:, :-1]
+        mask[1:, :] |= vertical
+        mask[:-1, :] |= vertical
+        mask[:, 1:] |= horizontal
+        mask[:, :-1] |= horizontal
+
+    return mask
+
+
+def coarse_to_fine_predict_proba(
+    model: Any,
+    cube: NDArray[Any],
+    factor: int = 4,
+    margin: float = 0.2,
+    refine_boundaries: bool = True,
+) -> Tuple[NDArray[Any], CoarseToFineStats]:
+    """
+    Predicts the probabilities of every pixel of a cube with the coarse-to-fine strategy.
+
+    Parameters
+    ----------
+    - `model`: Fitted `scikit-learn` estimator with `predict_proba()`.
+    - `cube`: Hyperspectral cube of shape (rows, columns, bands).
+    - `factor`: Spatial downsampling factor of the coarse step.
+    - `margin`: Probability margin below which a coarse pixel is refined.
+    - `refine_boundaries`: Flag to also refine coarse pixels on boundaries between classes.
+
+    Returns
+    -------
+    - Tuple with the probability map of shape (rows * columns, n_classes), which can be
+    passed to `ClassificationMap`, and the statistics of the classification.
+    """
+    assert len(cube.shape) == 3, "Cube must have 3 dimensions (width, height, bands)."
+    rows, cols, bands = cube.shape
+
+    # * Classify the downsampled cube and upsample it back to full resolution
+    start = time.perf_counter()
+    coarse_cube = downsample_cube(cube, factor)
+    coarse_proba = model.predict_proba(X=coarse_cube.reshape(-1, bands))
+    coarse_proba = coarse_proba.reshape(coarse_cube.shape[0], coarse_cube.shape[1], -1)
+
+    pred_map = np.repeat(np.repeat(coarse_proba, factor, axis=0), factor, axis=1)[:rows, :cols]
+    pred_map = pred_map.reshape(rows * cols, -1)
+
+    refine_mask = uncertain_blocks(coarse_proba, margin, refine_boundaries)
+    refine_mask = np.repeat(np.repeat(refine_mask, factor, axis=0), factor, axis=1)[:rows, :cols]
+    coarse_time = time.perf_counter() - start
+
+    # * Classify uncertain pixels again at full resolution
+    start = time.perf_counter()
+    refine_idx = np.flatnonzero(refine_mask)
+    if refine_idx.size:
+        pred_map[refine_idx] = model.predict_proba(X=cube.reshape(rows * cols, bands)[refine_idx])
+    refine_time = time.perf_counter() - start
+
+    stats = CoarseToFineStats(
+        factor=factor,
+        refined_pixels=int(refine_idx.size),
+        total_pixels=rows * cols,
+        coarse_time=coarse_time,
+        refine_time=refine_time,
+    )
+    return pred_map, stats
+
+
+def compare_with_exhaustive(
+    model: Any,
+    cube: NDArray[Any],
+    factor: int = 4,
+    margin: float = 0.2,
+    refine_boundaries: bool = True,
+) -> Dict[str, float]:
+    """
+    Classifies a cube with both the coarse-to-fine strategy and the exhaustive
+    `predict_proba()` and compares them.
+
+    Parameters
+    ----------
+    - Same parameters as `coarse_to_fine_predict_proba()`.
+
+    Returns
+    -------
+    - Python dictionary with the following keys:
+        - `refined_fraction`: Fraction of pixels classified at full resolution.
+        - `speedup`: Exhaustive time divided by coarse-to-fine time.
+        - `agreement`: Fraction of pixels with the same predicted class in both maps.
+        - `max_abs_error`: Maximum absolute difference between both probability maps.
+    """
+    start = time.perf_counter()
+    exhaustive = model.predict_proba(X=cube.reshape(cube.shape[0] * cube.shape[1], cube.shape[2]))
+    exhaustive_time = time.perf_counter() - start
+
+    pred_map, stats = coarse_to_fine_predict_proba(model, cube, factor, margin, refine_boundaries)
+
+    return {
+        "refined_fraction": stats.refined_fraction,
+        "speedup": exhaustive_time / stats.total_time,
+        "agreement": float(np.mean(np.argmax(pred_map, axis=1) == np.argmax(exhaustive, axis=1))),
+        "max_abs_error": float(np.max(np.abs(pred_map - exhaustive))),
+    }
+
+
+if __name__ == "__main__":
+    from sklearn.svm import SVC
+
+    from .helpers import load_cube, load_datasets
+
+    DATASET_PATH = "./data/dataset/"
+    CUBES_PATH = "./data/cubes/"
+    TRAIN_PATIENTS = ["ID0065C01", "ID0067C01", "ID0070C02"]
+    PATIENTS = ["ID0065C01", "ID0067C01", "ID0070C02", "ID0071C02"]
+
+    data, labels, _ = load_datasets(DATASET_PATH, TRAIN_PATIENTS)
+    model = SVC(kernel="linear", probability=True, random_state=2022)
+    model.fit(X=data, y=labels)
+
+    for patient_id in PATIENTS:
+        if not os.path.exists(f"{CUBES_PATH}SNAPimages{patient_id}_cropped_Pre-processed.mat"):
+            print(f"Cube of patient {patient_id} not found at {CUBES_PATH}. Skipping...")
+            continue
+
+        results = compare_with_exhaustive(model, load_cube(CUBES_PATH, patient_id))
+        print(
+            f"{patient_id}: refined {100*results['refined_fraction']:.2f}% of pixels, "
+            f"speedup x{results['speedup']:.2f}, agreement {100*results['agreement']:.2f}%"
+        )
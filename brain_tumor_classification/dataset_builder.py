@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Training dataset builder from hyperspectral cubes and ground-truth maps.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains functions to build training datasets without the
+    prebuilt `*_dataset.mat` files. The spectrum of every labeled pixel of
+    a `SNAPgt*` ground-truth map is gathered from the matching `SNAPimages*`
+    cube in a single indexing operation. Patients are processed in parallel
+    and stored as memory-mappable `.npy` files with a patient/coordinate index.
+   """
+
+import json
+import os
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+from joblib import Parallel, delayed
+from numpy.typing import NDArray
+
+from .ground_truth_maps import GroundTruthMap
+from .helpers import check_path, load_cube
+from .hsi_labels import HSI_LABEL_INFO
+
+
+def labeled_pixels(
+    gt_map: NDArray[Any],
+    class_caps: Union[int, Dict[int, int]] = None,
+    seed: int = None,
+) -> Tuple[NDArray[np.intp], NDArray[np.intp]]:
+    """
+    Returns the coordinates of the labeled pixels of a ground-truth map.
+
+    Parameters
+    ----------
+    - `gt_map`: Ground-truth map of shape (rows, columns). Pixels with label `0` are not labeled.
+    - `class_caps`: Maximum number of pixels per label. Either a single value for every label
+    or a dictionary `{label: cap}`. Labels not in the dictionary are not capped.
+    - `seed`: Seed of the random generator used to select capped pixels.
+
+    Returns
+    -------
+    - Tuple with the row and column coordinates of the selected pixels.
+    """
+    rows, cols = np.nonzero(gt_map)
+
+    if class_caps is not None:
+        rng = np.random.default_rng(seed)
+        labels = gt_map[rows, cols]
+        keep: List[NDArray[np.intp]] = []
+
+        for label in np.unique(labels):
+            label_idx = np.flatnonzero(labels == label)
+            cap = class_caps if isinstance(class_caps, int) else class_caps.get(int(label))
+            if cap is not None and label_idx.size > cap:
+                label_idx = rng.choice(label_idx, size=cap, replace=False)
+            keep.append(label_idx)
+
+        keep_idx = np.sort(np.concatenate(keep))
+        rows, cols = rows[keep_idx], cols[keep_idx]
+
+    return rows, cols
+
+
+def gather_patient(
+    cube_path: str,
+    gt_path: str,
+    patient_id: str,
+    class_caps: Union[int, Dict[int, int]] = None,
+    seed: int = None,
+) -> Dict[str, NDArray[Any]]:
+    """
+    Gathers the spectra and labels of every labeled pixel of a patient.
+
+    Parameters
+    ----------
+    - `cube_path`: Path with the `SNAPimages*_cropped_Pre-processed.mat` files.
+    - `gt_path`: Path with the `SNAPgt*_cropped_Pre-processed.mat` files.
+    - `patient_id`: ID of the patient.
+    - `class_caps`: Maximum number of pixels per label. See `labeled_pixels()`.
+    - `seed`: Seed of the random generator used to select capped pixels.
+
+    Returns
+    -------
+    - Python dictionary with the same keys as `*_dataset.mat` files (`data`, `label`,
+    `label4Classes`) plus `coords`, the (row, column) of every pixel in the cube.
+    """
+    gt_map = GroundTruthMap(gt_path, patient_id).groundTruthMap
+    cube = load_cube(cube_path, patient_id)
+
+    assert cube.shape[:2] == gt_map.shape, (
+        f"Cube {cube.shape} and ground-truth map {gt_map.shape} of patient {patient_id} "
+        "must have the same spatial size."
+    )
+
+    rows, cols = labeled_pixels(gt_map, class_caps, seed)
+    labels = gt_map[rows, cols].astype(np.uint16)
+
+    # Translate labels to label4Classes with a lookup table
+    label4class_lut = np.zeros(max(int(label) for label in HSI_LABEL_INFO) + 1, dtype=np.uint8)
+    for label, info in HSI_LABEL_INFO.items():
+        label4class_lut[int(label)] = info["label4Class"]
+
+    return {
+        "data": cube[rows, cols],  # Single vectorized gather of all labeled spectra
+        "label": labels,
+        "label4Classes": label4class_lut[labels],
+        "coords": np.stack([rows, cols], axis=1).astype(np.int32),
+    }
+
+
+class TrainingStore:
+    """
+    Class to read a training store written by `build_training_store()`. Arrays are
+    memory-mapped, so only the accessed samples are read from disk memory.
+    """
+
+    def __init__(self, path_: str) -> None:
+        """
+        TrainingStore class constructor.
+
+        Parameters
+        ----------
+        - `path_`: Path of the training store.
+        """
+        self.path = check_path(path_)
+
+        with open(f"{self.path}index.json", "r", encoding="utf-8") as index_file:
+            self._index: Dict[str, Any] = json.load(index_file)
+
+        self.data: NDArray[Any] = np.load(f"{self.path}data.npy", mmap_mode="r")
+        self.label: NDArray[Any] = np.load(f"{self.path}label.npy", mmap_mode="r")
+        self.label4Classes: NDArray[Any] = np.load(f"{self.path}label4Classes.npy", mmap_mode="r")
+        self.coords: NDArray[Any] = np.load(f"{self.path}coords.npy", mmap_mode="r")
+
+    @property
+    def patient_ids(self) -> List[str]:
+        """IDs of the patients included in the store."""
+        return list(self._index["patients"].keys())
+
+    def patient_slice(self, patient_id: str) -> slice:
+        """Returns the slice of the samples of a patient."""
+        start, stop = self._index["patients"][patient_id]
+        return slice(start, stop)
+
+    def load(self, patient_ids: List[str]) -> Tuple[NDArray[Any], NDArray[Any], NDArray[Any]]:
+        """
+        Loads the samples of several patients, as `helpers.load_datasets()`.
+
+        Parameters
+        ----------
+        - `patient_ids`: IDs of the patients to load.
+
+        Returns
+        -------
+        - Tuple with the samples of shape (n_samples, bands), the labels of shape (n_samples,)
+        and the patient ID of every sample, of shape (n_samples,).
+        """
+        slices = [self.patient_slice(patient_id) for patient_id in patient_ids]
+
+        data = np.concatenate([self.data[patient_slice] for patient_slice in slices], axis=0)
+        labels = np.concatenate([self.label[patient_slice] for patient_slice in slices], axis=0)
+        patients = np.concatenate(
+            [
+                np.full(patient_slice.stop - patient_slice.start, patient_id)
+                for patient_slice, patient_id in zip(slices, patient_ids)
+            ]
+        )
+        return data, labels, patients
+
+
+def build_training_store(
+    cube_path: str,
+    gt_path: str,
+    patient_ids: List[str],
+    store_path: str,
+    class_caps: Union[int, Dict[int, int]] = None,
+    seed: int = None,
+    n_jobs: int = -1,
+) -> TrainingStore:
+    """
+    Builds a training store with the labeled pixels of several patients.
+
+    Parameters
+    ----------
+    - `cube_path`: Path with the `SNAPimages*_cropped_Pre-processed.mat` files.
+    - `gt_path`: Path with the `SNAPgt*_cropped_Pre-processed.mat` files.
+    - `patient_ids`: IDs of the patients to include.
+    - `store_path`: Path where the store is written. Created if it does not exist.
+    - `class_caps`: Maximum number of pixels per label and patient. See `labeled_pixels()`.
+    - `seed`: Seed of the random generator used to select capped pixels.
+    - `n_jobs`: Number of patients processed in parallel.
+
+    Returns
+    -------
+    - `TrainingStore` with the written store.
+    """
+    patients = Parallel(n_jobs=n_jobs)(
+        delayed(gather_patient)(cube_path, gt_path, patient_id, class_caps, seed)
+        for patient_id in patient_ids
+    )
+
+    store_path = check_path(store_path)
+    for key in ("data", "label", "label4Classes", "coords"):
+        np.save(f"{store_path}{key}.npy", np.concatenate([patient[key] for patient in patients]))
+
+    index: Dict[str, Any] = {"patients": {}, "bands": int(patients[0]["data"].shape[1])}
+    start = 0
+    for patient_id, patient in zip(patient_ids, patients):
+        stop = start + patient["label"].shape[0]
+        index["patients"][patient_id] = [start, stop]
+        start = stop
+
+    with open(f"{store_path}index.json", "w", encoding="utf-8") as index_file:
+        json.dump(index, index_file, indent=4)
+
+    print(
+        f"Training store with {start} samples from {len(patient_ids)} patients "
+        f"written at {store_path}."
+    )
+
+    return TrainingStore(store_path)
+
+
+if __name__ == "__main__":
+    CUBES_PATH = "./data/cubes/"
+    GT_PATH = "./data/ground-truth/"
+    STORE_PATH = "./data/store/"
+    PATIENTS = ["ID0065C01", "ID0067C01", "ID0070C02", "ID0071C02"]
+
+    available = [
+        patient_id
+        for patient_id in PATIENTS
+        if os.path.exists(f"{CUBES_PATH}SNAPimages{patient_id}_cropped_Pre-processed.mat")
+    ]
+    if available:
+        build_training_store(CUBES_PATH, GT_PATH, available, STORE_PATH)
+    else:
+        print(f"No cubes found at {CUBES_PATH}.")
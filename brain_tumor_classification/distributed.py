@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Distributed hyperparameter and cross-patient evaluation.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains a task queue to distribute a leave-one-patient-out
+    sweep over (kernel, C, gamma) among any number of worker processes.
+    Each task holds a patient split, the SVM parameters and the path of the
+    datasets, so workers only need access to the same files. Tasks and
+    results are stored in a SQLite database: tasks are leased to workers,
+    retried when they fail or their lease expires, and results are written
+    only once, so finishing a task twice is harmless. Results can be
+    aggregated at any time, even while the sweep is still running.
+   """
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .helpers import load_datasets
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    task_id TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    worker TEXT,
+    finished REAL
+);
+"""
+
+
+def task_id(payload: Dict[str, Any]) -> str:
+    """Returns the ID of a task, computed from its payload so equal tasks share the same ID."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+class SQLiteBroker:
+    """
+    Task queue stored in a SQLite database. It can be shared by processes of the same host
+    or, placing the database in a shared file system with working file locks, of several hosts.
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = 3) -> None:
+        """
+        SQLiteBroker class constructor. The database is created if it does not exist.
+
+        Parameters
+        ----------
+        - `db_path`: Path of the SQLite database.
+        - `max_attempts`: Number of times a task is run before it is marked as failed.
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+
+        with self._transaction() as connection:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    connection.execute(statement)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Opens a connection with an exclusive write transaction, committed on exit."""
+        connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def submit(self, payloads: List[Dict[str, Any]]) -> int:
+        """
+        Adds tasks to the queue. Tasks already in the queue are ignored, so submitting
+        the same sweep twice does not duplicate work.
+
+        Parameters
+        ----------
+        - `payloads`: JSON-serializable description of every task.
+
+        Returns
+        -------
+        - Number of new tasks.
+        """
+        with self._transaction() as connection:
+            before = connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (id, payload) VALUES (?, ?)",
+                [(task_id(payload), json.dumps(payload, sort_keys=True)) for payload in payloads],
+            )
+            after = connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+        return after - before
+
+    def claim(self, worker: str, lease_seconds: float = 3600.0) -> Tuple[str, Dict[str, Any]]:
+        """
+        Leases a pending task (or a running task whose lease expired) to a worker.
+
+        Parameters
+        ----------
+        - `worker`: ID of the worker.
+        - `lease_seconds`: Seconds after which the task can be claimed by another worker
+        if it has not been completed.
+
+        Returns
+        -------
+        - Tuple with the ID and the payload of the task. `None` if no task is available.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            # Tasks whose last attempt expired without finishing will not be run again
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', error = 'Lease expired' "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = connection.execute(
+                "SELECT id, payload FROM tasks "
+                "WHERE (status = 'pending' OR (status = 'running' AND lease_until < ?)) "
+                "AND attempts < ? ORDER BY rowid LIMIT 1",
+                (now, self.max_attempts),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE tasks SET status = 'running', attempts = attempts + 1, "
+                "lease_until = ?, worker = ? WHERE id = ?",
+                (now + lease_seconds, worker, row[0]),
+            )
+
+        return row[0], json.loads(row[1])
+
+    def complete(self, task: str, result: Dict[str, Any], worker: str) -> None:
+        """
+        Stores the result of a task. Only the first result of a task is kept.
+
+        Parameters
+        ----------
+        - `task`: ID of the task.
+        - `result`: JSON-serializable result.
+        - `worker`: ID of the worker.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO results (task_id, result, worker, finished) "
+                "VALUES (?, ?, ?, ?)",
+                (task, json.dumps(result), worker, time.time()),
+            )
+            connection.execute(
+                "UPDATE tasks SET status = 'done', lease_until = NULL WHERE id = ?", (task,)
+            )
+
+    def fail(self, task: str, error: str, worker: str) -> None:
+        """
+        Records a failed attempt. The task is queued again until it reaches `max_attempts`.
+        It is ignored if the task is now leased to another worker (its lease expired).
+
+        Parameters
+        ----------
+        - `task`: ID of the task.
+        - `error`: Description of the error.
+        - `worker`: ID of the worker.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET "
+                "status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "lease_until = NULL, error = ? WHERE id = ? AND status = 'running' AND worker = ?",
+                (self.max_attempts, error, task, worker),
+            )
+
+    def progress(self) -> Dict[str, int]:
+        """Returns the number of tasks in every status (`pending`, `running`, `done`, `failed`)."""
+        with self._transaction() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+            return dict(rows.fetchall())
+
+    def results(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Returns the payload and the result of every completed task."""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT tasks.payload, results.result FROM results "
+                "JOIN tasks ON tasks.id = results.task_id"
+            ).fetchall()
+
+        return [(json.loads(payload), json.loads(result)) for payload, result in rows]
+
+
+def build_sweep_tasks(
+    dataset_path: str,
+    patient_ids: List[str],
+    param_grid: Dict[str, List[Any]],
+    seed: int = 2022,
+) -> List[Dict[str, Any]]:
+    """
+    Builds the tasks of a leave-one-patient-out sweep over a parameter grid.
+
+    Parameters
+    ----------
+    - `dataset_path`: Path with the `*_dataset.mat` files, accessible by every worker.
+    - `patient_ids`: IDs of the patients of the cohort.
+    - `param_grid`: Grid of `SVC` parameters, as in `GridSearchCV`. `gamma` is removed from
+    the parameters of linear kernels, so their candidates are not repeated per `gamma`.
+    - `seed`: Seed of the `SVC` estimators.
+
+    Returns
+    -------
+    - List with the payload of every (held-out patient, parameters) task.
+    """
+    from sklearn.model_selection import ParameterGrid
+
+    candidates: List[Dict[str, Any]] = []
+    for params in ParameterGrid(param_grid):
+        if params.get("kernel", "rbf") == "linear":
+            params = {name: value for name, value in params.items() if name != "gamma"}
+        if params not in candidates:
+            candidates.append(params)
+
+    return [
+        {
+            "dataset_path": dataset_path,
+            "train_patients": [patient for patient in patient_ids if patient != test_patient],
+            "test_patient": test_patient,
+            "params": params,
+            "seed": seed,
+        }
+        for test_patient in patient_ids
+        for params in candidates
+    ]
+
+
+def run_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Trains an `SVC` on the training patients of a task and evaluates it on the held-out patient.
+
+    Parameters
+    ----------
+    - `payload`: Task built by `build_sweep_tasks()`.
+
+    Returns
+    -------
+    - Python dictionary with the `accuracy`, the `fit_time` in seconds and the number of
+    training and test samples.
+    """
+    from sklearn.metrics import accuracy_score
+    from sklearn.svm import SVC
+
+    data, labels, _ = load_datasets(payload["dataset_path"], payload["train_patients"])
+    test_data, test_labels, _ = load_datasets(payload["dataset_path"], [payload["test_patient"]])
+
+    model = SVC(random_state=payload["seed"], **payload["params"])
+    start = time.perf_counter()
+    model.fit(X=data, y=labels)
+    fit_time = time.perf_counter() - start
+
+    return {
+        "accuracy": accuracy_score(y_true=test_labels, y_pred=model.predict(test_data)),
+        "fit_time": fit_time,
+        "n_train": int(data.shape[0]),
+        "n_test": int(test_data.shape[0]),
+    }
+
+
+def run_worker(
+    broker: SQLiteBroker,
+    worker: str = None,
+    max_tasks: int = None,
+    lease_seconds: float = 3600.0,
+) -> int:
+    """
+    Claims and runs tasks until the queue has no available tasks or `max_tasks` are run.
+
+    Parameters
+    ----------
+    - `broker`: Broker with the queued tasks.
+    - `worker`: ID of the worker. Host name and process ID by default.
+    - `max_tasks`: Maximum number of tasks to run.
+    - `lease_seconds`: Seconds a task is leased before other workers can claim it.
+
+    Returns
+    -------
+    - Number of tasks completed by the worker.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    completed = 0
+
+    while max_tasks is None or completed < max_tasks:
+        claimed = broker.claim(worker, lease_seconds)
+        if claimed is None:
+            break
+
+        task, payload = claimed
+        try:
+            result = run_task(payload)
+        except Exception:  # Any error is recorded and the task is retried
+            broker.fail(task, traceback.format_exc(), worker)
+            print(f"Worker {worker} failed task {task}.")
+            continue
+
+        broker.complete(task, result, worker)
+        completed += 1
+        print(
+            f"Worker {worker} completed {payload['params']} on patient {payload['test_patient']}: "
+            f"ACCURACY {100*result['accuracy']:.2f}%"
+        )
+
+    return completed
+
+
+def aggregate(broker: SQLiteBroker) -> List[Dict[str, Any]]:
+    """
+    Aggregates the completed tasks of a sweep per parameters. Parameters with missing
+    held-out patients are reported with the folds completed so far.
+
+    Returns
+    -------
+    - List of dictionaries with the `params`, the `mean_accuracy` and `std_accuracy` over
+    held-out patients, and the completed `folds`, sorted from best to worst mean accuracy.
+    """
+    accuracies: Dict[str, List[float]] = {}
+    for payload, result in broker.results():
+        key = json.dumps(payload["params"], sort_keys=True)
+        accuracies.setdefault(key, []).append(result["accuracy"])
+
+    summary = [
+        {
+            "params": json.loads(key),
+            "mean_accuracy": float(np.mean(values)),
+            "std_accuracy": float(np.std(values)),
+            "folds": len(values),
+        }
+        for key, values in accuracies.items()
+    ]
+    return sorted(summary, key=lambda row: row["mean_accuracy"], reverse=True)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Precomputed kernel matrices for hyperparameter optimization.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains a cache of Gram matrices of a training set, stored
+    memory-mapped in disk memory, and a grid search that evaluates SVM
+    candidates with `kernel="precomputed"`. Each (kernel, gamma) Gram
+    matrix is computed only once; cross-validation folds and the `C`
+    values are evaluated by slicing it, so wider `C` grids cost almost
+    nothing extra. Each matrix takes `8 * n_samples**2` bytes of disk
+    memory (about 1 GB for 11,371 samples), so the cache is bounded in size
+    and the grid search removes its matrices after using them by default.
+   """
+
+import os
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, List, Union
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .helpers import check_path, resolve_gamma
+from .prediction_cache import cube_fingerprint
+
+if TYPE_CHECKING:
+    from sklearn.svm import SVC
+
+
+class GramMatrixCache:
+    """
+    Class to compute and store memory-mapped Gram matrices of a training set.
+    Every matrix takes `8 * n_samples**2` bytes of disk memory.
+    """
+
+    def __init__(
+        self,
+        X: NDArray[Any],
+        path_: str = "./outputs/gram/",
+        block_size: int = 2048,
+        max_bytes: int = 4 * 1024**3,
+    ) -> None:
+        """
+        GramMatrixCache class constructor.
+
+        Parameters
+        ----------
+        - `X`: Training samples of shape (n_samples, bands).
+        - `path_`: Path where the Gram matrices are stored. Created if it does not exist.
+        - `block_size`: Number of rows computed at once. Bounds the memory used while
+        computing a Gram matrix to `block_size * n_samples` values.
+        - `max_bytes`: Maximum size in bytes of all the matrices stored in `path_`, including
+        matrices of other training sets. The least recently used ones are removed when it is
+        exceeded. The matrix being returned is never removed, even if it alone exceeds it.
+        """
+        self.X = np.asarray(X, dtype=np.float64)
+        self.path = check_path(path_)
+        self.block_size = block_size
+        self.max_bytes = max_bytes
+
+        self._fingerprint = cube_fingerprint(self.X)
+        self._sq_norms: NDArray[Any] = np.einsum("ij,ij->i", self.X, self.X)
+
+    def gram(self, kernel: str, gamma: Union[str, float] = "scale") -> NDArray[np.float64]:
+        """
+        Returns the Gram matrix of the training set. It is computed only if it is not stored yet.
+
+        Parameters
+        ----------
+        - `kernel`: Kernel of the matrix. Supported kernels: `linear`, `rbf`.
+        - `gamma`: Kernel coefficient of the `rbf` kernel (`scale`, `auto` or a number),
+        resolved on the training set as in `SVC`. Ignored for the `linear` kernel.
+
+        Returns
+        -------
+        - Read-only memory-mapped array of shape (n_samples, n_samples).
+        """
+        file_path = self._file_path(kernel, gamma)
+
+        if os.path.exists(file_path):
+            os.utime(file_path)  # Mark the matrix as recently used
+        else:
+            if kernel == "rbf":
+                gamma = resolve_gamma(gamma, self.X)
+            self._compute(kernel, gamma, file_path)
+            self._evict(keep=file_path)
+
+        return np.load(file_path, mmap_mode="r")
+
+    def remove(self, kernel: str, gamma: Union[str, float] = "scale") -> None:
+        """Removes a stored Gram matrix of the training set, if it exists."""
+        file_path = self._file_path(kernel, gamma)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    def _file_path(self, kernel: str, gamma: Any) -> str:
+        if kernel not in ("linear", "rbf"):
+            raise ValueError(f"{type(self).__name__} does not support the '{kernel}' kernel.")
+
+        name = f"{self._fingerprint}_{kernel}"
+        if kernel == "rbf":
+            name = f"{name}_{resolve_gamma(gamma, self.X)!r}"
+        return f"{self.path}{name}.npy"
+
+    def _evict(self, keep: str) -> None:
+        """Removes the least recently used matrices until they fit in `max_bytes`."""
+        matrices = {}
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(".npy") and not file_name.endswith(".tmp.npy"):
+                matrices[f"{self.path}{file_name}"] = os.stat(f"{self.path}{file_name}")
+        total_bytes = sum(stat.st_size for stat in matrices.values())
+
+        for file_path, stat in sorted(matrices.items(), key=lambda item: item[1].st_mtime_ns):
+            if total_bytes <= self.max_bytes:
+                break
+            if file_path != keep:
+                os.remove(file_path)
+                total_bytes -= stat.st_size
+
+    def _compute(self, kernel: str, gamma: float, file_path: str) -> None:
+        """Computes the Gram matrix by blocks of rows and stores it in `file_path`."""
+        n_samples = self.X.shape[0]
+        tmp_path = f"{file_path[:-len('.npy')]}.tmp.npy"
+
+        gram = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float64, shape=(n_samples, n_samples)
+        )
+        for start in range(0, n_samples, self.block_size):
+            stop = min(start + self.block_size, n_samples)
+            block = self.X[start:stop] @ self.X.T
+
+            if kernel == "rbf":
+                # ||x - y||^2 = ||x||^2 + ||y||^2 - 2 x·y
+                block *= -2.0
+                block += self._sq_norms[start:stop, None]
+                block += self._sq_norms[None, :]
+                np.maximum(block, 0.0, out=block)
+                block *= -gamma
+                np.exp(block, out=block)
+
+            gram[start:stop] = block
+
+        gram.flush()
+        del gram
+        os.replace(tmp_path, file_path)  # Atomic, so readers never see half-written matrices
+
+
+class PrecomputedGridSearchCV:
+    """
+    Grid search over `kernel`, `C` and `gamma` of an `SVC` estimator using precomputed
+    Gram matrices. It exposes the same attributes as `GridSearchCV` used in this project
+    (`best_params_`, `best_score_`, `cv_results_`, `best_estimator_`, `predict()`, ...).
+    """
+
+    def __init__(
+        self,
+        estimator: "SVC",
+        param_grid: Dict[str, List[Any]],
+        cv: Any = 5,
+        path_: str = "./outputs/gram/",
+        verbose: int = 0,
+        n_jobs: int = None,
+        keep_gram: bool = False,
+    ) -> None:
+        """
+        PrecomputedGridSearchCV class constructor.
+
+        Parameters
+        ----------
+        - `estimator`: `SVC` estimator refitted with the best parameters on the raw samples.
+        - `param_grid`: Grid with `kernel`, `C` and `gamma` values, as in `GridSearchCV`.
+        - `cv`: Cross-validation strategy, as in `GridSearchCV`.
+        - `path_`: Path where the Gram matrices are stored.
+        - `verbose`: Verbosity level passed to `GridSearchCV`.
+        - `n_jobs`: Number of jobs passed to `GridSearchCV`.
+        - `keep_gram`: If `True`, the Gram matrices are kept in `path_` (bounded by the size of
+        `GramMatrixCache`) to reuse them in later searches over the same samples. If `False`,
+        each matrix is removed after evaluating its candidates, so at most one is stored.
+        """
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.path = path_
+        self.verbose = verbose
+        self.n_jobs = n_jobs
+        self.keep_gram = keep_gram
+
+    def fit(self, X: NDArray[Any], y: NDArray[Any]) -> "PrecomputedGridSearchCV":
+        """
+        Evaluates every candidate of the grid and refits the best one on `X`.
+
+        Parameters
+        ----------
+        - `X`: Training samples of shape (n_samples, bands).
+        - `y`: Labels of shape (n_samples,).
+        """
+        from sklearn.base import clone
+        from sklearn.model_selection import GridSearchCV, ParameterGrid
+        from sklearn.svm import SVC
+
+        cache = GramMatrixCache(X, self.path)
+
+        # Group candidates sharing the same Gram matrix. `gamma` is not used by linear kernels,
+        # and rbf candidates without `gamma` use the one of the estimator (e.g. `scale`)
+        groups: Dict[tuple, List[float]] = defaultdict(list)
+        for params in ParameterGrid(self.param_grid):
+            kernel = params.get("kernel", self.estimator.kernel)
+            gamma = params.get("gamma") if kernel == "rbf" else None
+            if params.get("C", self.estimator.C) not in groups[(kernel, gamma)]:
+                groups[(kernel, gamma)].append(params.get("C", self.estimator.C))
+
+        results: List[Dict[str, Any]] = []
+        for (kernel, gamma), c_values in groups.items():
+            search = GridSearchCV(
+                estimator=SVC(kernel="precomputed", random_state=self.estimator.random_state),
+                param_grid={"C": c_values},
+                cv=self.cv,
+                refit=False,
+                verbose=self.verbose,
+                n_jobs=self.n_jobs,
+            )
+            matrix_gamma = self.estimator.gamma if gamma is None else gamma
+            gram = cache.gram(kernel, matrix_gamma)
+            search.fit(X=gram, y=y)
+            del gram  # Release the memory map before removing the file
+            if not self.keep_gram:
+                cache.remove(kernel, matrix_gamma)
+
+            for i, candidate in enumerate(search.cv_results_["params"]):
+                params = {"kernel": kernel, "C": candidate["C"]}
+                if gamma is not None:
+                    params["gamma"] = gamma
+                results.append(
+                    {
+                        "params": params,
+                        "mean_test_score": search.cv_results_["mean_test_score"][i],
+                        "std_test_score": search.cv_results_["std_test_score"][i],
+                    }
+                )
+
+        mean_scores = np.array([result["mean_test_score"] for result in results])
+        ranks = np.argsort(np.argsort(-mean_scores, kind="stable"), kind="stable") + 1
+        self.cv_results_ = {
+            "params": [result["params"] for result in results],
+            "mean_test_score": mean_scores,
+            "std_test_score": np.array([result["std_test_score"] for result in results]),
+            "rank_test_score": ranks,
+        }
+
+        best = int(np.argmin(ranks))
+        self.best_params_ = results[best]["params"]
+        self.best_score_ = results[best]["mean_test_score"]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+        self.best_estimator_.fit(X=X, y=y)
+
+        return self
+
+    @property
+    def classes_(self) -> NDArray[Any]:
+        """Classes of the refitted best estimator."""
+        return self.best_estimator_.classes_
+
+    def predict(self, X: NDArray[Any]) -> NDArray[Any]:
+        """Predicts the labels of `X` with the refitted best estimator."""
+        return self.best_estimator_.predict(X)
+
+    def predict_proba(self, X: NDArray[Any]) -> NDArray[Any]:
+        """Predicts the label probabilities of `X` with the refitted best estimator."""
+        return self.best_estimator_.predict_proba(X)
@@ -19,11 +19,9 @@ from typing import Any, Dict, Tuple, Union, List
 
 import numpy as np
 from numpy.typing import NDArray
-import matplotlib.pyplot as plt
-from scipy.io import loadmat
 
-from hsi_labels import HSI_LABEL_INFO
-from helpers import check_path
+from .hsi_labels import HSI_LABEL_INFO
+from .helpers import check_path, get_pyplot, loadmat
 
 
 @dataclass
@@ -49,13 +47,143 @@ class GroundTruthDataResults:
     gt: NDArray[np.double]
 
 
+# Names of the `dataResults` structure fields of every `GroundTruthDataResults` attribute
+DATA_RESULTS_FIELDS: Dict[str, str] = {
+    "number_of_reference_pixels": "numberOfReferencePixels",
+    "reference_spectrum": "referenceSpectrum",
+    "reference_pixel_coord": "referencePixelCoord",
+    "reference_class": "referenceClass",
+    "threshhold_value": "thresholdValue",
+    "comment": "comment",
+    "gt_map": "GTmap",
+    "rgb_image": "rgbImage",
+    "rgb_reference": "rgbReference",
+    "color_gt_map_r": "colorGTMapR",
+    "color_gt_map_g": "colorGTMapG",
+    "color_gt_map_b": "colorGTMapB",
+    "axs_rgb": "axsRgb",
+    "gt": "GT",
+}
+
+# Fields that are not stored in every `dataResults` structure
+OPTIONAL_DATA_RESULTS_FIELDS = ("rgb_reference", "axs_rgb")
+
+# Small fields describing the reference pixels, extracted together by `LazyGroundTruthDataResults`
+REFERENCE_DATA_RESULTS_FIELDS = (
+    "number_of_reference_pixels",
+    "reference_spectrum",
+    "reference_pixel_coord",
+    "reference_class",
+    "threshhold_value",
+    "comment",
+)
+
+
+def decode_data_results_field(data_results: NDArray, field: str) -> Any:
+    """
+    Extracts a single field from the `dataResults` structure loaded by `scipy.io.loadmat`.
+
+    Parameters
+    ----------
+    - `data_results`: `dataResults` structure of a ground-truth file.
+    - `field`: Name of the `GroundTruthDataResults` attribute to extract.
+    """
+    try:
+        value = data_results[DATA_RESULTS_FIELDS[field]][0, 0]
+    except ValueError:
+        if field in OPTIONAL_DATA_RESULTS_FIELDS:
+            return None
+        raise
+
+    if field == "number_of_reference_pixels":
+        value = value[0, 0]
+
+    return value
+
+
+class LazyGroundTruthDataResults:
+    """
+    Lazy alternative to `GroundTruthDataResults`. The `dataResults` structure is only
+    read from the `.mat` file when one of its fields is accessed for the first time.
+    Only the accessed fields are kept in memory: the rest of the structure is dropped
+    once they are extracted, so fields released with `release()` free their memory.
+    The small reference fields (`REFERENCE_DATA_RESULTS_FIELDS`) are extracted together the
+    first time one of them is accessed. Use `load()` to extract other fields in a single read.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        LazyGroundTruthDataResults class constructor.
+
+        Parameters
+        ----------
+        - `file_path`: Path of the `*gtID*_cropped_Pre-processed.mat` file.
+        """
+        self._file_path = file_path
+        self._fields: Dict[str, Any] = {}
+
+    def __getattr__(self, field: str) -> Any:
+        # Only called when `field` is not a regular attribute
+        if field not in DATA_RESULTS_FIELDS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{field}'")
+
+        if field not in self._fields:
+            if field in REFERENCE_DATA_RESULTS_FIELDS:
+                self.load(*REFERENCE_DATA_RESULTS_FIELDS)
+            else:
+                self.load(field)
+
+        return self._fields[field]
+
+    @property
+    def loaded_fields(self) -> List[str]:
+        """Fields currently kept in memory."""
+        return list(self._fields.keys())
+
+    def load(self, *fields: str) -> None:
+        """
+        Extracts fields with a single read of the `dataResults` structure. The structure
+        is not kept in memory, only the extracted fields.
+
+        Parameters
+        ----------
+        - `fields`: Names of the fields to extract. If none is passed, every field is extracted.
+        """
+        missing = [field for field in fields or DATA_RESULTS_FIELDS if field not in self._fields]
+        if not missing:
+            return
+
+        # `scipy.io.loadmat` cannot read single fields of a structure, so it is read whole
+        data_results = loadmat(self._file_path, variable_names=["dataResults"])["dataResults"]
+        for field in missing:
+            self._fields[field] = decode_data_results_field(data_results, field)
+
+    def release(self, *fields: str) -> None:
+        """
+        Releases fields from memory. They are read again from the file if accessed later.
+
+        Parameters
+        ----------
+        - `fields`: Names of the fields to release. If none is passed, every field is released.
+        """
+        for field in fields or list(self._fields):
+            self._fields.pop(field, None)
+
+    def to_dataclass(self) -> GroundTruthDataResults:
+        """Returns an eager `GroundTruthDataResults` with every field loaded."""
+        self.load()
+        return GroundTruthDataResults(
+            **{field: self._fields[field] for field in DATA_RESULTS_FIELDS}
+        )
+
+
 class GroundTruthMap:
     """
     GroundTruthMap to manage `*gtID*_cropped_Pre-processed` files.
     This class should not be used by the user.
     """
 
-    def __init__(self, path: str, patient_id: Union[str, List[str]]) -> None:
+    def __init__(self, path: str, patient_id: Union[str, List[str]], lazy: bool = True) -> None:
         """
         GroundTruthMap class constructor to load `*gtID*_cropped_Pre-processed.mat` files.
         Once the instance has been created, it automatically loads the preprocessed image.
@@ -64,9 +192,13 @@ class GroundTruthMap:
         ----------
         - `path`:             Path from where to load the preprocessed image.
         - `patients`:         Patient ID to be loaded
+        - `lazy`:             Flag to only load `groundTruthMap`. `dataResults` fields are
+        then loaded on first access (see `LazyGroundTruthDataResults`). Set to `False` to
+        load every field into a `GroundTruthDataResults` dataclass.
         """
 
         self.path = path
+        self.lazy = lazy
 
         if not isinstance(patient_id, str):
             print(
@@ -83,7 +215,7 @@ class GroundTruthMap:
         self.__version__: str = ""
         self.__globals__ = None
         self._groundTruthMap: NDArray[Any] = np.array(None)
-        self._dataResults: GroundTruthDataResults = None
+        self._dataResults: Union[GroundTruthDataResults, LazyGroundTruthDataResults] = None
 
         self._colored_gt: NDArray[Any] = np.array(None)
 
@@ -121,7 +253,7 @@ class GroundTruthMap:
         return self._groundTruthMap
 
     @property
-    def dataResults(self) -> GroundTruthDataResults:
+    def dataResults(self) -> Union[GroundTruthDataResults, LazyGroundTruthDataResults]:
         """
         `dataResults` property of the loaded preprocessed image.
         It returns `None` if the *gtID*_cropped_Pre-processed.mat` file
@@ -151,6 +283,8 @@ class GroundTruthMap:
             - Supported formats: `eps`, `jpeg`, `jpg`, `pdf`, `pgf`, `png`, `ps`, `raw`, `rgba`, `svg`, `svgz`, `tif`, `tiff`.
         """
 
+        plt = get_pyplot()
+
         fig = plt.figure()
         plt.title(title)
         plt.imshow(self._colored_gt)
@@ -171,7 +305,10 @@ class GroundTruthMap:
         """
         Loads the patient ground-truth map using the ID passed to the class constructor.
         """
-        mat_file = self.load_patient_gt(file_path=self.path, patient_id=self._patient_id)
+        variable_names = ["groundTruthMap"] if self.lazy else None
+        mat_file = self.load_patient_gt(
+            file_path=self.path, patient_id=self._patient_id, variable_names=variable_names
+        )
 
         self.__header__ = mat_file["__header__"]
         self.__version__ = mat_file["__version__"]
@@ -182,38 +319,24 @@ class GroundTruthMap:
         except KeyError:
             self._groundTruthMap = None
 
-        data_results: NDArray = mat_file["dataResults"]
-
-        try:
-            rgb_reference = data_results["rgbReference"][0, 0]
-        except ValueError:
-            rgb_reference = None
-
-        try:
-            axs_rgb = data_results["axsRgb"][0, 0]
-        except ValueError:
-            axs_rgb = None
-
-        self._dataResults = GroundTruthDataResults(
-            number_of_reference_pixels=data_results["numberOfReferencePixels"][0, 0][0, 0],
-            reference_spectrum=data_results["referenceSpectrum"][0, 0],
-            reference_pixel_coord=data_results["referencePixelCoord"][0, 0],
-            reference_class=data_results["referenceClass"][0, 0],
-            threshhold_value=data_results["thresholdValue"][0, 0],
-            comment=data_results["comment"][0, 0],
-            gt_map=data_results["GTmap"][0, 0],
-            rgb_image=data_results["rgbImage"][0, 0],
-            rgb_reference=rgb_reference,
-            color_gt_map_r=data_results["colorGTMapR"][0, 0],
-            color_gt_map_g=data_results["colorGTMapG"][0, 0],
-            color_gt_map_b=data_results["colorGTMapB"][0, 0],
-            axs_rgb=axs_rgb,
-            gt=data_results["GT"][0, 0],
-        )
+        if self.lazy:
+            self._dataResults = LazyGroundTruthDataResults(
+                self.patient_gt_file(self.path, self._patient_id)
+            )
+        else:
+            data_results: NDArray = mat_file["dataResults"]
+            self._dataResults = GroundTruthDataResults(
+                **{
+                    field: decode_data_results_field(data_results, field)
+                    for field in DATA_RESULTS_FIELDS
+                }
+            )
 
         print(f"The ground truth image from patient {self._patient_id} has been loaded.")
 
-    def load_patient_gt(self, file_path: str, patient_id: str) -> Dict[str, Any]:
+    def load_patient_gt(
+        self, file_path: str, patient_id: str, variable_names: List[str] = None
+    ) -> Dict[str, Any]:
         """
         Loads a single patient preprocessed image.
 
@@ -221,6 +344,7 @@ class GroundTruthMap:
         ----------
         - `file_path`: Path with the file to be loaded.
         - `patient_id`: ID of the patient ground-truth to load.
+        - `variable_names`: Variables to load from the file. If `None`, all of them are loaded.
 
         Returns
         -------
@@ -234,10 +358,15 @@ class GroundTruthMap:
         """
         print(f"Loading patient {patient_id} at {file_path}...")
 
+        return loadmat(self.patient_gt_file(file_path, patient_id), variable_names=variable_names)
+
+    @staticmethod
+    def patient_gt_file(file_path: str, patient_id: str) -> str:
+        """Returns the path of the ground-truth file of a patient."""
         if not file_path.endswith("/"):
             file_path = f"{file_path}/"
 
-        return loadmat(f"{file_path}SNAPgt{patient_id}_cropped_Pre-processed.mat")
+        return f"{file_path}SNAPgt{patient_id}_cropped_Pre-processed.mat"
 
     def compute_map(self) -> None:
         """
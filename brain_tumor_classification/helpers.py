@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Helpers functions useful for the entire package
+
+    -------------------------------------------------------------------------
+    AUTHOR
+
+    Name:       Alberto Martín Pérez
+    Contact:    a.martinp@upm.es
+
+    ------------------------------------------------------------------------
+    SUMMARY
+
+    Useful functions for various purposes for program executions.
+   """
+
+import os
+import sys
+from sys import platform
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from numpy.typing import NDArray
+
+
+def check_path(path_: str) -> str:
+    """
+    Checks if given path exists in disk memory. If it does not exist, it creates it.
+    Returns the path in case it does not end with `/` or `\\`.
+
+    Parameters
+    ----------
+    - `path_`:  Path to check if exist in disk memory. Creates it if does not exist.
+
+    Reference
+    ---------
+    - To create intermediate folders, the solution was based on:
+        https://stackoverflow.com/questions/59181118/os-mkdir-returns-error-filenotfounderror-errno-2-no-such-file-or-directory
+    """
+    # Linux uses '/' for directories
+    if platform == "linux" or platform == "linux2":
+        if not path_.endswith("/"):
+            path_ = f"{path_}/"
+
+    # Windows uses '\' for directories
+    elif platform == "win32":
+        if not path_.endswith("\\"):
+            path_ = f"{path_}\\"
+
+    # Create path if it does not exist
+    if not os.path.exists(path_):
+        os.makedirs(os.path.join(path_))
+
+    return path_
+
+
+def check_format(string_: str) -> str:
+    """
+    Checks if given string contains file format and removes it.
+
+    Parameters
+    ----------
+    - `string_`:  String to check if contains a file format.
+    """
+
+    if "." in string_:
+        string_, format_ = string_.split(".", 1)
+
+    return string_
+
+
+def resolve_gamma(gamma: Any, X: NDArray[Any]) -> float:
+    """
+    Resolves the `gamma` of an `SVC` into the number `scikit-learn` computes from the
+    training samples, so kernels computed outside `SVC.fit()` match the ones it uses.
+
+    Parameters
+    ----------
+    - `gamma`: `scale`, `auto` or a number.
+    - `X`: Training samples of shape (n_samples, bands).
+    """
+    if gamma == "scale":
+        variance = float(np.asarray(X, dtype=np.float64).var())
+        return 1.0 / (X.shape[1] * variance) if variance != 0 else 1.0
+    if gamma == "auto":
+        return 1.0 / X.shape[1]
+    if gamma is None or isinstance(gamma, str):
+        raise ValueError(f"gamma must be 'scale', 'auto' or a number, got {gamma!r}.")
+
+    return float(gamma)
+
+
+def loadmat(file_name: str, **kwargs: Any) -> Dict[str, Any]:
+    """
+    Loads a `.mat` file with `scipy.io.loadmat`. `scipy.io` is only imported the first
+    time a file is loaded, so importing this package stays fast.
+
+    Parameters
+    ----------
+    - `file_name`: Path of the `.mat` file.
+    - `kwargs`: Other parameters of `scipy.io.loadmat` (e.g. `variable_names`).
+    """
+    from scipy.io import loadmat as scipy_loadmat
+
+    return scipy_loadmat(file_name, **kwargs)
+
+
+def get_pyplot() -> Any:
+    """
+    Imports and returns `matplotlib.pyplot`. Unless a backend is selected with the
+    `MPLBACKEND` environment variable or `pyplot` was already imported, the headless
+    `Agg` backend is used, so plots can be saved on machines without a display.
+    """
+    if "matplotlib.pyplot" not in sys.modules and "MPLBACKEND" not in os.environ:
+        import matplotlib
+
+        matplotlib.use("Agg")
+
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def load_cube(path_: str, patient_id: str) -> NDArray[Any]:
+    """
+    Loads the preprocessed hyperspectral cube of a patient.
+
+    Parameters
+    ----------
+    - `path_`:  Path with the `SNAPimages*_cropped_Pre-processed.mat` files.
+    - `patient_id`: ID of the patient cube to load.
+
+    Returns
+    -------
+    - Numpy array of shape (rows, columns, bands).
+    """
+    if not path_.endswith("/"):
+        path_ = f"{path_}/"
+
+    preprocessed_mat = loadmat(f"{path_}SNAPimages{patient_id}_cropped_Pre-processed.mat")
+    return preprocessed_mat["preProcessedImage"]
+
+
+def load_datasets(
+    path_: str, patient_ids: List[str]
+) -> Tuple[NDArray[Any], NDArray[Any], NDArray[Any]]:
+    """
+    Loads and concatenates the `*_dataset.mat` files of several patients.
+
+    Parameters
+    ----------
+    - `path_`:  Path with the `*_dataset.mat` files.
+    - `patient_ids`: IDs of the patients to load.
+
+    Returns
+    -------
+    - Tuple with the samples of shape (n_samples, bands), the labels of shape (n_samples,)
+    and the patient ID of every sample, of shape (n_samples,).
+    """
+    if not path_.endswith("/"):
+        path_ = f"{path_}/"
+
+    datasets = [loadmat(f"{path_}{patient_id}_dataset.mat") for patient_id in patient_ids]
+
+    data = np.concatenate([dataset["data"] for dataset in datasets], axis=0)
+    labels = np.concatenate([dataset["label"] for dataset in datasets], axis=0).ravel()
+    patients = np.concatenate(
+        [
+            np.full(dataset["label"].shape[0], patient_id)
+            for dataset, patient_id in zip(datasets, patient_ids)
+        ]
+    )
+    return data, labels, patients
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Compact on-disk storage of classification outputs.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains functions to archive the probability maps predicted
+    for a patient. Probabilities are quantized to `uint8`/`uint16` and split
+    in spatial chunks, each compressed independently inside a `.npz` file,
+    together with the predicted class of every pixel and the metadata needed
+    to rebuild a `ClassificationMap` (model ID, labels and cube shape).
+    Since `.npz` members are decompressed on access, any region of the map
+    can be read back decompressing only the chunks it overlaps.
+   """
+
+import json
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .classification_maps import ClassificationMap
+
+
+def save_probability_map(
+    file_path: str,
+    pred_map: NDArray[Any],
+    cube_shape: Tuple[int, ...],
+    unique_labels: NDArray[Any],
+    model_id: str = "",
+    chunk_size: int = 64,
+    dtype: Any = np.uint8,
+) -> None:
+    """
+    Saves a probability map quantized and split in compressed spatial chunks.
+
+    Parameters
+    ----------
+    - `file_path`: Path of the `.npz` file to write.
+    - `pred_map`: Probability map of shape (n_samples, n_classes) predicted by `predict_proba()`.
+    - `cube_shape`: Shape of the classified cube.
+    - `unique_labels`: Labels of the columns of `pred_map`.
+    - `model_id`: Identifier of the model that predicted the map
+    (e.g. `prediction_cache.model_fingerprint(model)`).
+    - `chunk_size`: Rows and columns of every spatial chunk.
+    - `dtype`: Data type of the quantized probabilities. Supported: `np.uint8`, `np.uint16`.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.uint8, np.uint16):
+        raise ValueError(f"Probability maps can only be quantized to uint8 or uint16, not {dtype}.")
+
+    rows, cols = cube_shape[0], cube_shape[1]
+    proba = pred_map.reshape(rows, cols, -1)
+    scale = np.iinfo(dtype).max
+
+    quantized = np.rint(np.clip(proba, 0.0, 1.0) * scale).astype(dtype)
+    argmax = np.argmax(proba, axis=2).astype(np.uint8)
+
+    metadata = {
+        "model_id": model_id,
+        "unique_labels": np.asarray(unique_labels).tolist(),
+        "cube_shape": [int(dim) for dim in cube_shape],
+        "chunk_size": chunk_size,
+        "dtype": dtype.name,
+    }
+    arrays: Dict[str, NDArray[Any]] = {"metadata": np.array(json.dumps(metadata))}
+
+    for row in range(0, rows, chunk_size):
+        for col in range(0, cols, chunk_size):
+            chunk_id = f"{row // chunk_size}_{col // chunk_size}"
+            arrays[f"proba_{chunk_id}"] = quantized[row : row + chunk_size, col : col + chunk_size]
+            arrays[f"argmax_{chunk_id}"] = argmax[row : row + chunk_size, col : col + chunk_size]
+
+    np.savez_compressed(file_path, **arrays)
+
+
+class ProbabilityMapStore:
+    """Class to read probability maps written by `save_probability_map()`."""
+
+    def __init__(self, file_path: str) -> None:
+        """
+        ProbabilityMapStore class constructor. Only the metadata is read.
+
+        Parameters
+        ----------
+        - `file_path`: Path of the `.npz` file.
+        """
+        self._npz = np.load(file_path)
+        self._metadata: Dict[str, Any] = json.loads(str(self._npz["metadata"]))
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Model ID, labels, cube shape, chunk size and data type of the stored map."""
+        return self._metadata
+
+    @property
+    def unique_labels(self) -> NDArray[Any]:
+        """Labels of the classes of the stored map."""
+        return np.array(self._metadata["unique_labels"])
+
+    @property
+    def cube_shape(self) -> Tuple[int, ...]:
+        """Shape of the classified cube."""
+        return tuple(self._metadata["cube_shape"])
+
+    def close(self) -> None:
+        """Closes the `.npz` file."""
+        self._npz.close()
+
+    def read_proba(self, rows: slice = slice(None), cols: slice = slice(None)) -> NDArray[Any]:
+        """
+        Reads the probabilities of a region of the map.
+
+        Parameters
+        ----------
+        - `rows`: Rows of the region. All rows by default.
+        - `cols`: Columns of the region. All columns by default.
+
+        Returns
+        -------
+        - Numpy array of shape (region rows, region columns, n_classes) with `float32`
+        probabilities. Every pixel is renormalized to sum 1, undoing the rounding error.
+        """
+        proba = self._read_region("proba", rows, cols).astype(np.float32)
+        return proba / np.maximum(proba.sum(axis=2, keepdims=True), np.finfo(np.float32).tiny)
+
+    def read_labels(self, rows: slice = slice(None), cols: slice = slice(None)) -> NDArray[Any]:
+        """
+        Reads the predicted label of every pixel of a region of the map.
+
+        Parameters
+        ----------
+        - `rows`: Rows of the region. All rows by default.
+        - `cols`: Columns of the region. All columns by default.
+
+        Returns
+        -------
+        - Numpy array of shape (region rows, region columns).
+        """
+        return self.unique_labels[self._read_region("argmax", rows, cols)]
+
+    def classification_map(
+        self, rows: slice = slice(None), cols: slice = slice(None)
+    ) -> ClassificationMap:
+        """
+        Builds the `ClassificationMap` of a region of the stored map. The binary map uses
+        the stored predicted classes, since quantized probabilities can have tied maxima.
+
+        Parameters
+        ----------
+        - `rows`: Rows of the region. All rows by default.
+        - `cols`: Columns of the region. All columns by default.
+        """
+        proba = self.read_proba(rows, cols)
+        return ClassificationMap(
+            map=proba.reshape(proba.shape[0] * proba.shape[1], proba.shape[2]),
+            cube_shape=proba.shape,
+            unique_labels=self.unique_labels,
+            argmax=self._read_region("argmax", rows, cols).ravel(),
+        )
+
+    def _read_region(self, name: str, rows: slice, cols: slice) -> NDArray[Any]:
+        """Assembles a region decompressing only the chunks it overlaps."""
+        if rows.step not in (None, 1) or cols.step not in (None, 1):
+            raise ValueError("Only contiguous regions (slices with step 1) can be read.")
+
+        chunk_size = self._metadata["chunk_size"]
+        row_start, row_stop, _ = rows.indices(self._metadata["cube_shape"][0])
+        col_start, col_stop, _ = cols.indices(self._metadata["cube_shape"][1])
+        if row_start >= row_stop or col_start >= col_stop:
+            raise ValueError(
+                f"Region (rows {rows.start}:{rows.stop}, columns {cols.start}:{cols.stop}) does "
+                f"not overlap the map of {self._metadata['cube_shape'][0]} rows and "
+                f"{self._metadata['cube_shape'][1]} columns."
+            )
+
+        region = None
+        for chunk_row in range(row_start // chunk_size, -(-row_stop // chunk_size)):
+            for chunk_col in range(col_start // chunk_size, -(-col_stop // chunk_size)):
+                chunk = self._npz[f"{name}_{chunk_row}_{chunk_col}"]
+                if region is None:
+                    region = np.empty(
+                        (row_stop - row_start, col_stop - col_start) + chunk.shape[2:],
+                        dtype=chunk.dtype,
+                    )
+
+                # Intersection of the chunk and the region in map coordinates
+                top, left = chunk_row * chunk_size, chunk_col * chunk_size
+                r0, r1 = max(top, row_start), min(top + chunk.shape[0], row_stop)
+                c0, c1 = max(left, col_start), min(left + chunk.shape[1], col_stop)
+                region[r0 - row_start : r1 - row_start, c0 - col_start : c1 - col_start] = chunk[
+                    r0 - top : r1 - top, c0 - left : c1 - left
+                ]
+
+        return region
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Parallel training of multiclass SVMs as binary sub-problems.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains an SVM classifier that decomposes the multiclass
+    problem into its one-vs-one (or one-vs-rest) binary sub-problems and
+    trains them in a pool of worker processes. Training samples are shared
+    with the workers as a memory-mapped array, and each worker only copies
+    the rows of its pair of classes. The fitted classifier provides
+    `predict()` and `predict_proba()`, so it can be used with `ClassificationMap`.
+   """
+
+import time
+from itertools import combinations
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from numpy.typing import NDArray
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.svm import SVC
+
+from .helpers import resolve_gamma
+
+
+def _fit_binary(
+    X: NDArray[Any], y: NDArray[Any], classes: Tuple[Any, ...], params: Dict[str, Any]
+) -> SVC:
+    """
+    Fits a binary SVM. With two `classes`, only their rows are used (one-vs-one).
+    With a single class, every row is used and labeled as that class or not (one-vs-rest).
+    """
+    if len(classes) == 2:
+        rows = np.flatnonzero((y == classes[0]) | (y == classes[1]))
+        X_pair, y_pair = X[rows], y[rows]  # Only the rows of the pair are copied
+    else:
+        X_pair, y_pair = X, (y == classes[0]).astype(np.int8)
+
+    return SVC(**params).fit(X=X_pair, y=y_pair)
+
+
+def pairwise_coupling(pairwise_proba: NDArray[Any]) -> NDArray[Any]:
+    """
+    Combines one-vs-one probabilities into multiclass probabilities, with the second
+    method of Wu, Lin and Weng (2004), also used by `libsvm`.
+
+    Parameters
+    ----------
+    - `pairwise_proba`: Array of shape (n_samples, n_classes, n_classes) where
+    `pairwise_proba[:, i, j]` is the probability of class `i` given class `i` or `j`.
+
+    Returns
+    -------
+    - Numpy array of shape (n_samples, n_classes).
+    """
+    n_samples, n_classes, _ = pairwise_proba.shape
+    r = np.clip(pairwise_proba, 1e-7, 1 - 1e-7)
+
+    # Minimize p^T Q p subject to sum(p) = 1, solving the linear system of its Lagrangian
+    Q = -r.transpose(0, 2, 1) * r
+    diagonal = np.einsum("nji,nji->ni", r, r) - np.einsum("nii,nii->ni", r, r)
+    Q[:, np.arange(n_classes), np.arange(n_classes)] = diagonal
+
+    system = np.ones((n_samples, n_classes + 1, n_classes + 1))
+    system[:, :n_classes, :n_classes] = Q
+    system[:, n_classes, n_classes] = 0.0
+    rhs = np.zeros((n_samples, n_classes + 1, 1))
+    rhs[:, n_classes] = 1.0
+
+    proba = np.linalg.solve(system, rhs)[:, :n_classes, 0]
+    proba = np.clip(proba, 0.0, None)
+    return proba / proba.sum(axis=1, keepdims=True)
+
+
+class ParallelOneVsOneSVC(ClassifierMixin, BaseEstimator):
+    """SVM classifier that trains its binary sub-problems in parallel worker processes."""
+
+    def __init__(
+        self,
+        kernel: str = "rbf",
+        C: float = 1.0,
+        gamma: Any = "scale",
+        probability: bool = True,
+        strategy: str = "ovo",
+        n_jobs: int = -1,
+        random_state: int = None,
+    ) -> None:
+        """
+        ParallelOneVsOneSVC class constructor.
+
+        Parameters
+        ----------
+        - `kernel`, `C`, `gamma`, `probability`, `random_state`: Parameters of every binary `SVC`.
+        `gamma` values `scale` and `auto` are computed on the whole training set, as in `SVC`.
+        - `strategy`: Decomposition of the multiclass problem. Supported: `ovo` (one-vs-one),
+        `ovr` (one-vs-rest).
+        - `n_jobs`: Number of worker processes training binary sub-problems.
+        """
+        self.kernel = kernel
+        self.C = C
+        self.gamma = gamma
+        self.probability = probability
+        self.strategy = strategy
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X: NDArray[Any], y: NDArray[Any]) -> "ParallelOneVsOneSVC":
+        """
+        Trains every binary sub-problem in parallel.
+
+        Parameters
+        ----------
+        - `X`: Training samples of shape (n_samples, bands).
+        - `y`: Labels of shape (n_samples,).
+        """
+        if self.strategy not in ("ovo", "ovr"):
+            raise ValueError(
+                f"{type(self).__name__} does not support the '{self.strategy}' strategy."
+            )
+
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        y = np.asarray(y).ravel()
+        self.classes_: NDArray[Any] = np.unique(y)
+
+        if self.strategy == "ovo":
+            self.subproblems_: List[Tuple[Any, ...]] = list(combinations(self.classes_, 2))
+        else:
+            self.subproblems_ = [(label,) for label in self.classes_]
+
+        # `scale` and `auto` are resolved on every sample, not on the rows of each sub-problem
+        params = {
+            "kernel": self.kernel,
+            "C": self.C,
+            "gamma": resolve_gamma(self.gamma, X),
+            "probability": self.probability,
+            "random_state": self.random_state,
+        }
+
+        # Arrays larger than `max_nbytes` are memory-mapped instead of copied to every worker
+        self.estimators_: List[SVC] = Parallel(n_jobs=self.n_jobs, max_nbytes="1M")(
+            delayed(_fit_binary)(X, y, classes, params) for classes in self.subproblems_
+        )
+        return self
+
+    def predict_proba(self, X: NDArray[Any]) -> NDArray[Any]:
+        """
+        Predicts the label probabilities of every sample.
+
+        Parameters
+        ----------
+        - `X`: Samples of shape (n_samples, bands).
+
+        Returns
+        -------
+        - Numpy array of shape (n_samples, n_classes), with classes ordered as `classes_`.
+        """
+        if not self.probability:
+            raise AttributeError("predict_proba is only available when probability=True.")
+
+        n_classes = self.classes_.shape[0]
+
+        if self.strategy == "ovr":
+            proba = np.stack([est.predict_proba(X)[:, 1] for est in self.estimators_], axis=1)
+            return proba / proba.sum(axis=1, keepdims=True)
+
+        pairwise_proba = np.zeros((X.shape[0], n_classes, n_classes))
+        for (i, j), est in zip(combinations(range(n_classes), 2), self.estimators_):
+            pair_proba = est.predict_proba(X)
+            pairwise_proba[:, i, j] = pair_proba[:, 0]
+            pairwise_proba[:, j, i] = pair_proba[:, 1]
+
+        return pairwise_coupling(pairwise_proba)
+
+    def predict(self, X: NDArray[Any]) -> NDArray[Any]:
+        """
+        Predicts the label of every sample by majority vote of the one-vs-one sub-problems,
+        or by the most confident one-vs-rest sub-problem.
+
+        Parameters
+        ----------
+        - `X`: Samples of shape (n_samples, bands).
+        """
+        n_classes = self.classes_.shape[0]
+
+        if self.strategy == "ovr":
+            scores = np.stack([est.decision_function(X) for est in self.estimators_], axis=1)
+            return self.classes_[np.argmax(scores, axis=1)]
+
+        votes = np.zeros((X.shape[0], n_classes), dtype=np.int32)
+        for (i, j), est in zip(combinations(range(n_classes), 2), self.estimators_):
+            winner_is_j = est.predict(X) == self.classes_[j]
+            votes[:, i] += ~winner_is_j
+            votes[:, j] += winner_is_j
+
+        return self.classes_[np.argmax(votes, axis=1)]
+
+
+def fit_time_scaling(
+    X: NDArray[Any], y: NDArray[Any], n_jobs_list: List[int], **params: Any
+) -> Dict[str, float]:
+    """
+    Measures the fit time of `ParallelOneVsOneSVC` with different numbers of workers,
+    and of a single `SVC` trained by `libsvm` as reference.
+
+    Parameters
+    ----------
+    - `X`: Training samples of shape (n_samples, bands).
+    - `y`: Labels of shape (n_samples,).
+    - `n_jobs_list`: Numbers of workers to measure.
+    - `params`: Parameters of `ParallelOneVsOneSVC`.
+
+    Returns
+    -------
+    - Python dictionary with the fit time in seconds of `SVC` and of every number of workers.
+    """
+    svc_params = {key: value for key, value in params.items() if key not in ("strategy", "n_jobs")}
+
+    start = time.perf_counter()
+    SVC(**svc_params).fit(X=X, y=y)
+    fit_times = {"SVC": time.perf_counter() - start}
+
+    for n_jobs in n_jobs_list:
+        start = time.perf_counter()
+        ParallelOneVsOneSVC(n_jobs=n_jobs, **params).fit(X=X, y=y)
+        fit_times[f"n_jobs={n_jobs}"] = time.perf_counter() - start
+
+    return fit_times
+
+
+if __name__ == "__main__":
+    import os
+
+    from sklearn.metrics import accuracy_score
+
+    from .helpers import load_datasets
+
+    DATASET_PATH = "./data/dataset/"
+    TRAIN_PATIENTS = ["ID0065C01", "ID0067C01", "ID0070C02"]
+    TEST_PATIENT = "ID0071C02"
+
+    data, labels, _ = load_datasets(DATASET_PATH, TRAIN_PATIENTS)
+    test_data, test_labels, _ = load_datasets(DATASET_PATH, [TEST_PATIENT])
+    params = {"kernel": "linear", "probability": True, "random_state": 2022}
+
+    n_jobs_list = [n_jobs for n_jobs in (1, 2, 4, 8) if n_jobs <= os.cpu_count()]
+    for name, fit_time in fit_time_scaling(data, labels, n_jobs_list, **params).items():
+        print(f"Fit time ({name}): {fit_time:.2f}s")
+
+    model = ParallelOneVsOneSVC(**params).fit(X=data, y=labels)
+    acc = accuracy_score(y_true=test_labels, y_pred=model.predict(test_data))
+    print(f"ACCURACY (on new data with {type(model).__name__}): {100*acc:.2f}%")
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" On-disk cache of predicted probability maps.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains a content-addressed cache that stores the output of
+    `predict_proba()` for every (model, cube) pair. Entries are keyed by a
+    fingerprint of the fitted estimator and a fingerprint of the cube, so
+    a classification map can be re-rendered (new title, file format...)
+    without classifying the whole cube again. The cache is bounded in size
+    and evicts the least recently used entries first.
+   """
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .classification_maps import ClassificationMap
+from .helpers import check_path
+
+
+@dataclass
+class CacheStats:
+    """Dataclass with the hit/miss statistics of a `PredictionCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# Fitted attributes of `SVC` stored as private attributes (`probA_` and `probB_` are properties)
+_PRIVATE_FITTED_ATTRIBUTES = ("_probA", "_probB", "_gamma")
+
+
+def _update_digest(digest: Any, value: Any) -> None:
+    """Adds a value to a fingerprint, encoding arrays and estimators independently of pickle."""
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        value = np.ascontiguousarray(value)
+        digest.update(f"ndarray{value.shape}{value.dtype.str}".encode())
+        digest.update(memoryview(value).cast("B"))
+    elif isinstance(value, np.ndarray):
+        digest.update(f"ndarray{value.shape}{value.tolist()!r}".encode())
+    elif isinstance(value, dict):
+        digest.update(f"dict{len(value)}".encode())
+        for key, item in sorted(value.items(), key=lambda entry: repr(entry[0])):
+            digest.update(repr(key).encode())
+            _update_digest(digest, item)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_digest(digest, item)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        digest.update(model_fingerprint(value).encode())
+    else:
+        digest.update(repr(value).encode())
+
+
+def model_fingerprint(model: Any) -> str:
+    """
+    Computes a fingerprint of a fitted `scikit-learn` estimator from its parameters and its
+    fitted attributes (`support_vectors_`, `dual_coef_`, `intercept_`, `probA_`, `classes_`...).
+    Unlike a hash of its pickle, an estimator and its copy loaded from disk share the fingerprint.
+
+    Parameters
+    ----------
+    - `model`: Fitted estimator or search (e.g. `PrecomputedGridSearchCV`).
+    """
+    digest = hashlib.sha256(type(model).__qualname__.encode())
+
+    # Estimators without `get_params()` (e.g. `PrecomputedGridSearchCV`) use their public attributes
+    if hasattr(model, "get_params"):
+        params = model.get_params(deep=False)
+    else:
+        params = {name: value for name, value in vars(model).items() if not name.startswith("_")}
+    fitted = {
+        name: value
+        for name, value in vars(model).items()
+        if name.endswith("_") and not name.startswith("_")
+    }
+    for name in _PRIVATE_FITTED_ATTRIBUTES:
+        if name in vars(model):
+            fitted[name] = vars(model)[name]
+
+    for name, value in sorted(params.items()) + sorted(fitted.items()):
+        digest.update(name.encode())
+        _update_digest(digest, value)
+
+    return digest.hexdigest()[:32]
+
+
+def cube_fingerprint(cube: NDArray[Any]) -> str:
+    """
+    Computes a fingerprint of a hyperspectral cube using its shape, data type and values.
+
+    Parameters
+    ----------
+    - `cube`: Hyperspectral cube of any shape.
+    """
+    cube = np.ascontiguousarray(cube)
+    digest = hashlib.sha256(f"{cube.shape}{cube.dtype.str}".encode())
+    digest.update(memoryview(cube).cast("B"))
+    return digest.hexdigest()[:32]
+
+
+class PredictionCache:
+    """
+    Class to store probability maps predicted by `predict_proba()` in disk memory.
+    Each entry is a compressed `.npz` file with the probabilities as `float32`,
+    the classes of the estimator and the shape of the classified cube.
+    """
+
+    def __init__(self, path_: str = "./outputs/cache/", max_bytes: int = 1024**3) -> None:
+        """
+        PredictionCache class constructor.
+
+        Parameters
+        ----------
+        - `path_`:      Path where cache entries are stored. Created if it does not exist.
+        - `max_bytes`:  Maximum size in bytes of all the entries. The least recently used
+        entries are removed when it is exceeded, except the entry just stored.
+        """
+        self.path = check_path(path_)
+        self.max_bytes = max_bytes
+        self._stats = CacheStats()
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit, miss and eviction counters since the cache was created."""
+        return self._stats
+
+    @property
+    def size(self) -> int:
+        """Total size in bytes of the entries currently stored in the cache."""
+        return sum(os.path.getsize(entry) for entry in self._entries())
+
+    def key(self, model: Any, cube: NDArray[Any]) -> str:
+        """Returns the cache key of a (model, cube) pair."""
+        return f"{model_fingerprint(model)}_{cube_fingerprint(cube)}"
+
+    def get(self, key: str) -> Optional[Tuple[NDArray[Any], NDArray[Any], Tuple[int, ...]]]:
+        """
+        Retrieves an entry from the cache.
+
+        Parameters
+        ----------
+        - `key`: Cache key returned by `key()`.
+
+        Returns
+        -------
+        - Tuple with the probability map of shape (n_samples, n_classes), the classes
+        of the estimator and the shape of the classified cube. `None` if the key is not stored.
+        """
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            self._stats.misses += 1
+            return None
+
+        with np.load(entry) as npz:
+            pred_map = npz["pred_map"]
+            classes = npz["classes"]
+            cube_shape = tuple(int(dim) for dim in npz["cube_shape"])
+
+        os.utime(entry)  # Mark the entry as recently used
+        self._stats.hits += 1
+        return pred_map, classes, cube_shape
+
+    def put(
+        self,
+        key: str,
+        pred_map: NDArray[Any],
+        classes: NDArray[Any],
+        cube_shape: Tuple[int, ...],
+    ) -> None:
+        """
+        Stores an entry in the cache and evicts old entries if the cache exceeds `max_bytes`.
+
+        Parameters
+        ----------
+        - `key`: Cache key returned by `key()`.
+        - `pred_map`: Probability map of shape (n_samples, n_classes).
+        - `classes`: Classes of the estimator that predicted the map (`model.classes_`).
+        - `cube_shape`: Shape of the classified cube.
+        """
+        entry = self._entry_path(key)
+        tmp_entry = f"{entry[:-len('.npz')]}.tmp.npz"
+        np.savez_compressed(
+            tmp_entry,
+            pred_map=pred_map.astype(np.float32),
+            classes=np.asarray(classes),
+            cube_shape=np.asarray(cube_shape),
+        )
+        os.replace(tmp_entry, entry)  # Atomic, so readers never see half-written entries
+
+        self._evict(keep=entry)
+
+    def predict_proba(self, model: Any, cube: NDArray[Any]) -> NDArray[Any]:
+        """
+        Returns the probability map of `cube` predicted by `model`, as `float32` like the
+        cache entries. It only calls `model.predict_proba()` if the pair is not stored in the cache.
+
+        Parameters
+        ----------
+        - `model`: Fitted `scikit-learn` estimator with `predict_proba()`.
+        - `cube`: Hyperspectral cube of shape (rows, columns, bands).
+        """
+        assert len(cube.shape) == 3, "Cube must have 3 dimensions (width, height, bands)."
+
+        key = self.key(model, cube)
+        entry = self.get(key)
+        if entry is not None:
+            return entry[0]
+
+        pred_map = model.predict_proba(X=cube.reshape(cube.shape[0] * cube.shape[1], cube.shape[2]))
+        pred_map = pred_map.astype(np.float32)
+        self.put(key, pred_map, model.classes_, cube.shape)
+        return pred_map
+
+    def classification_map(self, model: Any, cube: NDArray[Any]) -> ClassificationMap:
+        """
+        Returns the `ClassificationMap` of `cube` classified by `model`, using the cache
+        to avoid predicting the cube again.
+
+        Parameters
+        ----------
+        - `model`: Fitted `scikit-learn` estimator with `predict_proba()`.
+        - `cube`: Hyperspectral cube of shape (rows, columns, bands).
+        """
+        return ClassificationMap(
+            map=self.predict_proba(model, cube),
+            cube_shape=cube.shape,
+            unique_labels=model.classes_,
+        )
+
+    def clear(self) -> None:
+        """Removes all the entries of the cache. Statistics are kept."""
+        for entry in self._entries():
+            os.remove(entry)
+
+    def _entry_path(self, key: str) -> str:
+        return f"{self.path}{key}.npz"
+
+    def _entries(self) -> Dict[str, os.stat_result]:
+        entries = {}
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(".npz") and not file_name.endswith(".tmp.npz"):
+                entry = f"{self.path}{file_name}"
+                entries[entry] = os.stat(entry)
+        return entries
+
+    def _evict(self, keep: str) -> None:
+        """
+        Removes the least recently used entries until the cache fits in `max_bytes`.
+        The `keep` entry is never removed, even if it alone exceeds `max_bytes`.
+        """
+        entries = self._entries()
+        total_bytes = sum(stat.st_size for stat in entries.values())
+
+        for entry, stat in sorted(entries.items(), key=lambda item: item[1].st_mtime_ns):
+            if total_bytes <= self.max_bytes:
+                break
+            if entry != keep:
+                os.remove(entry)
+                total_bytes -= stat.st_size
+                self._stats.evictions += 1
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Nearest-neighbour spectral search over labeled reference spectra.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains a KD-tree index over labeled spectra, built either
+    from the reference spectra stored in the `dataResults` structure of the
+    ground-truth maps or from training samples. Whole cubes are queried in
+    batches, so it can be used both as a fast k-NN baseline classifier
+    (compatible with `ClassificationMap`) and to find which labeled
+    reference spectrum is closest to every pixel.
+   """
+
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+from sklearn.neighbors import KDTree
+
+from .ground_truth_maps import GroundTruthMap
+
+
+class SpectralIndex:
+    """Class to search the labeled reference spectra closest to a set of pixels."""
+
+    def __init__(
+        self,
+        spectra: NDArray[Any],
+        labels: NDArray[Any],
+        patients: NDArray[Any] = None,
+        coords: NDArray[Any] = None,
+        leaf_size: int = 40,
+    ) -> None:
+        """
+        SpectralIndex class constructor.
+
+        Parameters
+        ----------
+        - `spectra`: Reference spectra of shape (n_references, bands).
+        - `labels`: Label of every reference spectrum, of shape (n_references,).
+        - `patients`: Patient ID of every reference spectrum, of shape (n_references,).
+        - `coords`: 0-based (row, column) of every reference spectrum in its cube,
+        of shape (n_references, 2).
+        - `leaf_size`: Leaf size of the KD-tree.
+        """
+        self.spectra = np.asarray(spectra, dtype=np.float64)
+        self.labels = np.asarray(labels).ravel()
+        self.patients = patients
+        self.coords = coords
+
+        self.classes_: NDArray[Any] = np.unique(self.labels)
+        self._label_idx = np.searchsorted(self.classes_, self.labels)
+        self._tree = KDTree(self.spectra, leaf_size=leaf_size)
+
+    @classmethod
+    def from_ground_truth(cls, gt_maps: List[GroundTruthMap], **kwargs: Any) -> "SpectralIndex":
+        """
+        Builds an index with the reference spectra of several ground-truth maps.
+
+        Parameters
+        ----------
+        - `gt_maps`: Loaded `GroundTruthMap` objects.
+        - `kwargs`: Other parameters of the class constructor.
+        """
+        spectra, labels, patients, coords = [], [], [], []
+        for gt in gt_maps:
+            data_results = gt.dataResults
+            spectra.append(data_results.reference_spectrum)
+            labels.append([int(ref_class[0][0]) for ref_class in data_results.reference_class])
+            patients.append(np.full(data_results.reference_spectrum.shape[0], gt.patient_id))
+            # MATLAB coordinates are 1-based
+            coords.append(data_results.reference_pixel_coord.astype(np.int32) - 1)
+
+        return cls(
+            spectra=np.concatenate(spectra, axis=0),
+            labels=np.concatenate(labels),
+            patients=np.concatenate(patients),
+            coords=np.concatenate(coords, axis=0),
+            **kwargs,
+        )
+
+    def query(
+        self, X: NDArray[Any], k: int = 1, batch_size: int = 65536
+    ) -> Tuple[NDArray[np.float64], NDArray[np.intp]]:
+        """
+        Searches the `k` reference spectra closest to every sample.
+
+        Parameters
+        ----------
+        - `X`: Samples of shape (n_samples, bands).
+        - `k`: Number of neighbours.
+        - `batch_size`: Number of samples queried at once.
+
+        Returns
+        -------
+        - Tuple with the euclidean distances and the indices of the neighbours, both of
+        shape (n_samples, k), sorted from closest to farthest.
+        """
+        distances = np.empty((X.shape[0], k), dtype=np.float64)
+        indices = np.empty((X.shape[0], k), dtype=np.intp)
+
+        for start in range(0, X.shape[0], batch_size):
+            stop = min(start + batch_size, X.shape[0])
+            distances[start:stop], indices[start:stop] = self._tree.query(X[start:stop], k=k)
+
+        return distances, indices
+
+    def nearest(self, cube: NDArray[Any]) -> Dict[str, NDArray[Any]]:
+        """
+        Finds the closest reference spectrum to every pixel of a cube.
+
+        Parameters
+        ----------
+        - `cube`: Hyperspectral cube of shape (rows, columns, bands).
+
+        Returns
+        -------
+        - Python dictionary with maps of shape (rows, columns) with the `distance`, `label`
+        and `patient` of the closest reference, and a `coords` map of shape (rows, columns, 2)
+        with its 0-based (row, column) in its cube.
+        `patient` and `coords` are only included if the index has them.
+        """
+        assert len(cube.shape) == 3, "Cube must have 3 dimensions (width, height, bands)."
+        rows, cols = cube.shape[:2]
+
+        distances, indices = self.query(cube.reshape(rows * cols, cube.shape[2]), k=1)
+        indices = indices[:, 0]
+
+        result = {
+            "distance": distances[:, 0].reshape(rows, cols),
+            "label": self.labels[indices].reshape(rows, cols),
+        }
+        if self.patients is not None:
+            result["patient"] = self.patients[indices].reshape(rows, cols)
+        if self.coords is not None:
+            result["coords"] = self.coords[indices].reshape(rows, cols, 2)
+
+        return result
+
+    def predict_proba(self, X: NDArray[Any], k: int = 5) -> NDArray[np.float64]:
+        """
+        Predicts the label probabilities of every sample as the fraction of its `k`
+        nearest references with each label.
+
+        Parameters
+        ----------
+        - `X`: Samples of shape (n_samples, bands).
+        - `k`: Number of neighbours. Limited to the number of references.
+
+        Returns
+        -------
+        - Numpy array of shape (n_samples, n_classes), which can be passed to `ClassificationMap`.
+        """
+        k = min(k, self.labels.shape[0])
+        _, indices = self.query(X, k=k)
+
+        neighbour_classes = self._label_idx[indices]
+        proba = np.zeros((X.shape[0], self.classes_.shape[0]), dtype=np.float64)
+        for neighbour in range(k):
+            proba[np.arange(X.shape[0]), neighbour_classes[:, neighbour]] += 1.0
+
+        return proba / k
+
+    def predict(self, X: NDArray[Any], k: int = 5) -> NDArray[Any]:
+        """Predicts the label of every sample by majority vote of its `k` nearest references."""
+        return self.classes_[np.argmax(self.predict_proba(X, k), axis=1)]
+
+
+if __name__ == "__main__":
+    from sklearn.metrics import accuracy_score
+    from sklearn.svm import SVC
+
+    from .helpers import load_datasets
+
+    DATASET_PATH = "./data/dataset/"
+    GT_PATH = "./data/ground-truth/"
+    TRAIN_PATIENTS = ["ID0065C01", "ID0067C01", "ID0070C02"]
+    TEST_PATIENT = "ID0071C02"
+
+    data, labels, patients = load_datasets(DATASET_PATH, TRAIN_PATIENTS)
+    test_data, test_labels, _ = load_datasets(DATASET_PATH, [TEST_PATIENT])
+
+    svc = SVC(kernel="linear", probability=True, random_state=2022)
+    svc.fit(X=data, y=labels)
+
+    classifiers = {
+        "SVC (linear)": (svc, {}),
+        "k-NN over ground-truth references (k=1)": (
+            SpectralIndex.from_ground_truth([GroundTruthMap(GT_PATH, p) for p in TRAIN_PATIENTS]),
+            {"k": 1},
+        ),
+        "k-NN over training samples (k=5)": (SpectralIndex(data, labels, patients), {"k": 5}),
+    }
+
+    for name, (classifier, kwargs) in classifiers.items():
+        start = time.perf_counter()
+        proba = classifier.predict_proba(test_data, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        predictions = classifier.classes_[np.argmax(proba, axis=1)]
+        acc = accuracy_score(y_true=test_labels, y_pred=predictions)
+        print(
+            f"{name}: ACCURACY {100*acc:.2f}%, "
+            f"{test_data.shape[0] / elapsed:.0f} pixels/s on patient {TEST_PATIENT}"
+        )
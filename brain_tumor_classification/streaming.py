@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Streaming classification of intraoperative hyperspectral captures.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains classes to classify a sequence of cubes captured
+    from the same surgical field. Only the pixels whose spectra changed
+    more than a tolerance since they were last classified are predicted
+    again. The probabilities of the remaining pixels are carried forward
+    and the `ClassificationMap` is recolored only where it changed.
+   """
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .classification_maps import ClassificationMap
+from .helpers import loadmat
+
+
+@dataclass
+class FrameStats:
+    """Dataclass with the statistics of a classified frame."""
+
+    frame: int
+    changed_pixels: int
+    total_pixels: int
+    latency: float
+
+    @property
+    def reuse_rate(self) -> float:
+        """Fraction of pixels whose probabilities were carried forward from previous frames."""
+        return 1.0 - self.changed_pixels / self.total_pixels
+
+
+class StreamingClassifier:
+    """Class to classify sequences of cubes reusing the predictions of unchanged pixels."""
+
+    def __init__(self, model: Any, tolerance: float = 0.01) -> None:
+        """
+        StreamingClassifier class constructor.
+
+        Parameters
+        ----------
+        - `model`: Fitted `scikit-learn` estimator with `predict_proba()`.
+        - `tolerance`: Maximum absolute difference in any band for a pixel spectrum to be
+        considered unchanged since it was last classified.
+        """
+        self.model = model
+        self.tolerance = tolerance
+
+        self._reference_cube: NDArray[Any] = np.array(None)
+        self._pred_map: NDArray[Any] = np.array(None)
+        self._cls_map: ClassificationMap = None
+        self._frame = 0
+
+    @property
+    def classification_map(self) -> ClassificationMap:
+        """`ClassificationMap` of the last frame. `None` if no frame has been classified."""
+        return self._cls_map
+
+    @property
+    def pred_map(self) -> NDArray[Any]:
+        """Probability map of shape (n_samples, n_classes) of the last classified frame."""
+        return self._pred_map
+
+    def reset(self) -> None:
+        """Forgets previous frames, so the next frame is classified entirely."""
+        self._reference_cube = np.array(None)
+        self._pred_map = np.array(None)
+        self._cls_map = None
+        self._frame = 0
+
+    def update(self, cube: NDArray[Any]) -> FrameStats:
+        """
+        Classifies a new frame, predicting only the pixels that changed.
+
+        Parameters
+        ----------
+        - `cube`: Hyperspectral cube of shape (rows, columns, bands).
+
+        Returns
+        -------
+        - Statistics of the classified frame.
+        """
+        assert len(cube.shape) == 3, "Cube must have 3 dimensions (width, height, bands)."
+        start = time.perf_counter()
+
+        pixels = cube.reshape(cube.shape[0] * cube.shape[1], cube.shape[2])
+
+        # First frame (or a frame with a different shape) is classified entirely
+        if self._cls_map is None or self._reference_cube.shape != cube.shape:
+            self._reference_cube = np.array(cube, copy=True)
+            self._pred_map = self.model.predict_proba(X=pixels)
+            self._cls_map = ClassificationMap(
+                map=self._pred_map,
+                cube_shape=cube.shape,
+                unique_labels=self.model.classes_,
+            )
+            changed_idx = np.arange(pixels.shape[0])
+
+        else:
+            # Compare against the spectra used for the last prediction of each pixel,
+            # so slow drifts below the tolerance between frames are still detected
+            difference = np.abs(cube - self._reference_cube).max(axis=2)
+            changed_idx = np.flatnonzero(difference > self.tolerance)
+
+            if changed_idx.size:
+                rows, cols = np.unravel_index(changed_idx, cube.shape[:2])
+                self._reference_cube[rows, cols] = cube[rows, cols]
+                self._cls_map.update(changed_idx, self.model.predict_proba(X=pixels[changed_idx]))
+
+        stats = FrameStats(
+            frame=self._frame,
+            changed_pixels=int(changed_idx.size),
+            total_pixels=pixels.shape[0],
+            latency=time.perf_counter() - start,
+        )
+        self._frame += 1
+        return stats
+
+    def stream(
+        self, cubes: Iterable[NDArray[Any]]
+    ) -> Iterator[Tuple[ClassificationMap, FrameStats]]:
+        """
+        Classifies every cube of a sequence.
+
+        Parameters
+        ----------
+        - `cubes`: Iterable of cubes, e.g. a generator or `watch_directory()`.
+
+        Returns
+        -------
+        - Iterator of tuples with the updated `ClassificationMap` and the frame statistics.
+        """
+        for cube in cubes:
+            stats = self.update(cube)
+            yield self._cls_map, stats
+
+
+def watch_directory(
+    path_: str,
+    key: str = "preProcessedImage",
+    poll_interval: float = 0.5,
+    timeout: float = 10.0,
+) -> Iterator[NDArray[Any]]:
+    """
+    Yields the cubes of the `.mat` files that appear in a directory, in name order.
+    Files present when the watcher starts are also yielded. Captures should be written
+    atomically (e.g. saved with another extension and renamed to `.mat`).
+
+    Parameters
+    ----------
+    - `path_`: Directory where captures are written.
+    - `key`: Variable of the `.mat` files containing the cube.
+    - `poll_interval`: Seconds to wait between directory listings.
+    - `timeout`: Seconds without new files after which the watcher stops.
+    """
+    seen = set()
+    last_capture = time.monotonic()
+
+    while time.monotonic() - last_capture < timeout:
+        new_files = sorted(
+            file_name
+            for file_name in os.listdir(path_)
+            if file_name.endswith(".mat") and file_name not in seen
+        )
+
+        for file_name in new_files:
+            seen.add(file_name)
+            yield loadmat(os.path.join(path_, file_name))[key]
+            last_capture = time.monotonic()
+
+        if not new_files:
+            time.sleep(poll_interval)
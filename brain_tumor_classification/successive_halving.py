@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Successive-halving hyperparameter optimization.
+
+    SUMMARY
+    ------------------------------------------------------------------------
+    This file contains a budgeted alternative to `GridSearchCV`. Every
+    candidate is first evaluated on a small subset of pixels stratified by
+    patient and label. Only the best fraction of candidates is kept for the
+    next round, where the number of pixels per patient and label grows.
+    Candidates of a round are evaluated in parallel workers.
+   """
+
+import time
+from typing import TYPE_CHECKING, Any, Dict, List
+
+import numpy as np
+from joblib import Parallel, delayed
+from numpy.typing import NDArray
+
+if TYPE_CHECKING:
+    from sklearn.svm import SVC
+
+
+def stratified_subset(
+    labels: NDArray[Any], patients: NDArray[Any], budget: int, seed: int = None
+) -> NDArray[np.intp]:
+    """
+    Draws at most `budget` pixels of every (patient, label) pair.
+
+    Parameters
+    ----------
+    - `labels`: Labels of shape (n_samples,).
+    - `patients`: Patient ID of every sample, of shape (n_samples,).
+    - `budget`: Maximum number of pixels per patient and label.
+    - `seed`: Seed of the random generator.
+
+    Returns
+    -------
+    - Sorted indices of the selected pixels.
+    """
+    rng = np.random.default_rng(seed)
+
+    pairs = np.stack([patients.astype(str), labels.astype(str)], axis=1)
+    _, groups = np.unique(pairs, axis=0, return_inverse=True)
+    groups = groups.ravel()
+
+    subset: List[NDArray[np.intp]] = []
+    for group in np.unique(groups):
+        group_idx = np.flatnonzero(groups == group)
+        if group_idx.size > budget:
+            group_idx = rng.choice(group_idx, size=budget, replace=False)
+        subset.append(group_idx)
+
+    return np.sort(np.concatenate(subset))
+
+
+def candidate_params(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Expands a grid into its candidates, as `ParameterGrid`. `gamma` is removed from the
+    candidates with a linear kernel, so they are not repeated once per `gamma` value.
+
+    Parameters
+    ----------
+    - `param_grid`: Grid of `SVC` parameters, as in `GridSearchCV`.
+    """
+    from sklearn.model_selection import ParameterGrid
+
+    candidates: List[Dict[str, Any]] = []
+    for params in ParameterGrid(param_grid):
+        if params.get("kernel", "rbf") == "linear":
+            params = {name: value for name, value in params.items() if name != "gamma"}
+        if params not in candidates:
+            candidates.append(params)
+    return candidates
+
+
+def _evaluate(estimator: Any, X: NDArray[Any], y: NDArray[Any], cv: Any) -> Dict[str, float]:
+    """Cross-validates a single candidate and returns its mean score and compute time."""
+    from sklearn.model_selection import cross_validate
+
+    scores = cross_validate(estimator, X, y, cv=cv)
+    return {
+        "score": float(np.mean(scores["test_score"])),
+        "time": float(np.sum(scores["fit_time"]) + np.sum(scores["score_time"])),
+    }
+
+
+class SuccessiveHalvingSearch:
+    """
+    Successive-halving search over the parameters of an estimator. It exposes the same
+    attributes as `GridSearchCV` used in this project (`best_params_`, `best_score_`,
+    `best_estimator_`, `predict()`, ...).
+    """
+
+    def __init__(
+        self,
+        estimator: "SVC",
+        param_grid: Dict[str, List[Any]],
+        min_budget: int = 20,
+        eta: int = 3,
+        cv: Any = 3,
+        n_jobs: int = -1,
+        random_state: int = None,
+        verbose: int = 0,
+    ) -> None:
+        """
+        SuccessiveHalvingSearch class constructor.
+
+        Parameters
+        ----------
+        - `estimator`: Estimator refitted with the best parameters on all the samples.
+        Candidates are evaluated with `probability=False`, since it does not affect predictions.
+        - `param_grid`: Grid with the candidate parameters, as in `GridSearchCV`. Linear
+        candidates are evaluated once, whatever the number of `gamma` values.
+        - `min_budget`: Pixels per patient and label in the first round.
+        - `eta`: Only `1 / eta` candidates are kept after each round, and the budget is
+        multiplied by `eta`.
+        - `cv`: Cross-validation strategy used to score candidates in each round.
+        - `n_jobs`: Number of parallel workers evaluating candidates.
+        - `random_state`: Seed used to draw the pixel subsets.
+        - `verbose`: Flag to print the results of every round.
+        """
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.min_budget = min_budget
+        self.eta = eta
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.verbose = verbose
+
+    def fit(
+        self, X: NDArray[Any], y: NDArray[Any], groups: NDArray[Any]
+    ) -> "SuccessiveHalvingSearch":
+        """
+        Runs the successive-halving rounds and refits the best candidate on `X`.
+
+        Parameters
+        ----------
+        - `X`: Training samples of shape (n_samples, bands).
+        - `y`: Labels of shape (n_samples,).
+        - `groups`: Patient ID of every sample, of shape (n_samples,).
+        """
+        from sklearn.base import clone
+
+        candidates = candidate_params(self.param_grid)
+        budget = self.min_budget
+        self.history_: List[Dict[str, Any]] = []
+        self.compute_time_ = 0.0
+
+        with Parallel(n_jobs=self.n_jobs) as parallel:
+            while True:
+                subset = stratified_subset(y, groups, budget, seed=self.random_state)
+                results = parallel(
+                    delayed(_evaluate)(
+                        clone(self.estimator).set_params(probability=False, **params),
+                        X[subset],
+                        y[subset],
+                        self.cv,
+                    )
+                    for params in candidates
+                )
+                scores = np.array([result["score"] for result in results])
+                self.compute_time_ += sum(result["time"] for result in results)
+
+                self.history_.append(
+                    {
+                        "budget": budget,
+                        "n_samples": subset.size,
+                        "params": candidates,
+                        "scores": scores,
+                    }
+                )
+                if self.verbose:
+                    print(
+                        f"Round {len(self.history_)}: {len(candidates)} candidates on "
+                        f"{subset.size} pixels. Best score: {scores.max():.4f}"
+                    )
+
+                # Stop when a single candidate survives or the subset already has every pixel
+                if len(candidates) == 1 or subset.size == y.size:
+                    break
+
+                n_keep = int(np.ceil(len(candidates) / self.eta))
+                best_idx = np.argsort(-scores, kind="stable")[:n_keep]
+                candidates = [candidates[i] for i in best_idx]
+                budget *= self.eta
+
+        best = int(np.argmax(scores))
+        self.best_params_ = candidates[best]
+        self.best_score_ = float(scores[best])
+
+        start = time.perf_counter()
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+        self.best_estimator_.fit(X=X, y=y)
+        self.refit_time_ = time.perf_counter() - start
+
+        return self
+
+    @property
+    def classes_(self) -> NDArray[Any]:
+        """Classes of the refitted best estimator."""
+        return self.best_estimator_.classes_
+
+    def predict(self, X: NDArray[Any]) -> NDArray[Any]:
+        """Predicts the labels of `X` with the refitted best estimator."""
+        return self.best_estimator_.predict(X)
+
+    def predict_proba(self, X: NDArray[Any]) -> NDArray[Any]:
+        """Predicts the label probabilities of `X` with the refitted best estimator."""
+        return self.best_estimator_.predict_proba(X)
+
+
+def compare_with_exhaustive(
+    search: SuccessiveHalvingSearch, X: NDArray[Any], y: NDArray[Any], groups: NDArray[Any]
+) -> Dict[str, Any]:
+    """
+    Runs both a `SuccessiveHalvingSearch` and an exhaustive `GridSearchCV` with the same
+    estimator, grid and cross-validation strategy, and compares them.
+
+    Parameters
+    ----------
+    - `search`: Unfitted `SuccessiveHalvingSearch`.
+    - `X`: Training samples of shape (n_samples, bands).
+    - `y`: Labels of shape (n_samples,).
+    - `groups`: Patient ID of every sample, of shape (n_samples,).
+
+    Returns
+    -------
+    - Python dictionary with the following keys:
+        - `halving_time`: Fit and score time in seconds spent by all halving rounds.
+        - `exhaustive_time`: Fit and score time in seconds spent by `GridSearchCV`.
+        - `compute_ratio`: `halving_time` divided by `exhaustive_time`.
+        - `halving_params` and `exhaustive_params`: Best parameters of each search.
+        - `same_winner`: Flag indicating whether both searches picked the same parameters.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import GridSearchCV
+
+    search.fit(X, y, groups)
+
+    # The exhaustive search evaluates the same candidates, without repeated linear kernels
+    exhaustive = GridSearchCV(
+        estimator=clone(search.estimator).set_params(probability=False),
+        param_grid=[
+            {name: [value] for name, value in params.items()}
+            for params in candidate_params(search.param_grid)
+        ],
+        cv=search.cv,
+        refit=False,
+        n_jobs=search.n_jobs,
+    )
+    exhaustive.fit(X=X, y=y)
+    exhaustive_time = float(
+        np.sum(exhaustive.cv_results_["mean_fit_time"] + exhaustive.cv_results_["mean_score_time"])
+        * exhaustive.n_splits_
+    )
+
+    return {
+        "halving_time": search.compute_time_,
+        "exhaustive_time": exhaustive_time,
+        "compute_ratio": search.compute_time_ / exhaustive_time,
+        "halving_params": search.best_params_,
+        "exhaustive_params": exhaustive.best_params_,
+        "same_winner": search.best_params_ == exhaustive.best_params_,
+    }
+
+
+if __name__ == "__main__":
+    from sklearn import svm
+
+    from .helpers import load_datasets
+
+    DATASET_PATH = "./data/dataset/"
+    TRAIN_PATIENTS = ["ID0065C01", "ID0067C01", "ID0070C02"]
+
+    data, labels, patients = load_datasets(DATASET_PATH, TRAIN_PATIENTS)
+    hyperparameters = {"kernel": ("linear", "rbf"), "C": [0.1, 1, 10, 100], "gamma": [0.1, 1, 10]}
+
+    search = SuccessiveHalvingSearch(
+        estimator=svm.SVC(probability=True, random_state=2022),
+        param_grid=hyperparameters,
+        random_state=2022,
+        verbose=1,
+    )
+    results = compare_with_exhaustive(search, data, labels, patients)
+
+    print(f"Halving:    {results['halving_params']} in {results['halving_time']:.2f}s")
+    print(f"Exhaustive: {results['exhaustive_params']} in {results['exhaustive_time']:.2f}s")
+    print(
+        f"Compute spent: {100*results['compute_ratio']:.2f}% of the exhaustive grid. "
+        f"Same winner: {results['same_winner']}"
+    )
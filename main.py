@@ -3,9 +3,11 @@ from scipy.io import loadmat
 import numpy as np
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score
-from sklearn.model_selection import GridSearchCV
-from classification_maps import ClassificationMap  # Ensure these modules exist
-from ground_truth_maps import GroundTruthMap  # Ensure these modules exist
+from brain_tumor_classification.classification_maps import ClassificationMap  # Ensure these modules exist
+from brain_tumor_classification.ground_truth_maps import GroundTruthMap  # Ensure these modules exist
+from brain_tumor_classification.gram_cache import PrecomputedGridSearchCV
+from brain_tumor_classification.output_store import save_probability_map
+from brain_tumor_classification.prediction_cache import PredictionCache, model_fingerprint
 
 # Load the .mat file to a variable
 patient_1_dataset = loadmat(r"Brain_SVM//data/dataset/ID0065C01_dataset.mat")
@@ -75,10 +77,10 @@ patient_id = "ID0071C02"
 preprocessed_mat = loadmat(rf"Brain_SVM/data/cubes/SNAPimages{patient_id}_cropped_Pre-processed.mat")
 cube = preprocessed_mat["preProcessedImage"]
 
-# Reshape cube for prediction
+# Predict the cube. Probability maps are cached, so re-plotting does not classify the cube again
 assert len(cube.shape) == 3, "Cube must have 3 dimensions (width, height, bands)."
-cube_reshaped = cube.reshape((cube.shape[0] * cube.shape[1]), cube.shape[2])
-pred_map = model.predict_proba(X=cube_reshaped)
+prediction_cache = PredictionCache("./outputs/cache/")
+pred_map = prediction_cache.predict_proba(model, cube)
 
 # Generate and save classification map
 os.makedirs("./outputs/", exist_ok=True)
@@ -94,6 +96,13 @@ cls_map.plot(
     file_suffix=f"{patient_id}",
     file_format="png",
 )
+save_probability_map(
+    f"./outputs/ProbabilityMap_{patient_id}.npz",
+    pred_map=pred_map,
+    cube_shape=cube.shape,
+    unique_labels=model.classes_,
+    model_id=model_fingerprint(model),
+)
 
 # Generate ground truth map
 gt = GroundTruthMap(r"Brain_SVM/data/ground-truth/", patient_id)
@@ -106,13 +115,15 @@ gt.plot(
 )
 
 # ------------------------------------------------------
-# Hyperparameter optimization with GridSearchCV
+# Hyperparameter optimization with precomputed Gram matrices (computed once per kernel and gamma).
+# Each matrix takes 8 * n_samples**2 bytes of disk memory (~1 GB here) and is removed once used
 hyperparameters = {"kernel": ("linear", "rbf"), "C": [1], "gamma": [1]}
-model = GridSearchCV(
+model = PrecomputedGridSearchCV(
     estimator=SVC(probability=True, random_state=seed),
     param_grid=hyperparameters,
     verbose=4,
     cv=5,  # Cross-validation folds
+    path_="./outputs/gram/",
 )
 model.fit(X=data, y=labels)
 print(f"Best parameters found: {model.best_params_}")
@@ -124,7 +135,7 @@ new_acc = accuracy_score(y_true=patient_new_dataset["label"].ravel(), y_pred=new
 print(f"ACCURACY (on new data with optimized SVM): {100*new_acc:.2f}%")
 
 # Classify image with optimized SVM
-pred_map = model.predict_proba(X=cube_reshaped)
+pred_map = prediction_cache.predict_proba(model, cube)
 cls_map = ClassificationMap(
     map=pred_map,
     cube_shape=cube.shape,
@@ -137,3 +148,11 @@ cls_map.plot(
     file_suffix=f"{patient_id}_optimized",
     file_format="png",
 )
+save_probability_map(
+    f"./outputs/ProbabilityMap_{patient_id}_optimized.npz",
+    pred_map=pred_map,
+    cube_shape=cube.shape,
+    unique_labels=model.classes_,
+    model_id=model_fingerprint(model),
+)
+print(f"Prediction cache: {prediction_cache.stats}")